@@ -0,0 +1,59 @@
+from collections import namedtuple
+import asyncio
+import threading
+import time
+
+# A solution found during a run. Elapsed is the number of seconds since the run started.
+Incumbent = namedtuple("Incumbent", ["pattern", "fitness", "num_bins", "elapsed"])
+
+
+def make_deadline(start_time, budget=None, deadline=None):
+    """
+    Combines a budget and a deadline into a single deadline.
+    :param start_time: The time.monotonic() at which the run started.
+    :param budget: An optional number of seconds that the run may take.
+    :param deadline: An optional time.monotonic() by which the run has to stop.
+    :return: The earliest of the two, or None if neither was given.
+    """
+    if budget is not None:
+        deadline = start_time + budget if deadline is None else min(deadline, start_time + budget)
+    return deadline
+
+
+def expired(deadline=None, stop=None):
+    """
+    Checks whether a run has to stop.
+    :param deadline: An optional time.monotonic() by which the run has to stop.
+    :param stop: An optional threading.Event that is set when the run has to stop early.
+    :return: True if the deadline has passed or the event is set, False otherwise.
+    """
+    return (deadline is not None and time.monotonic() >= deadline) or (stop is not None and stop.is_set())
+
+
+async def run_anytime(search, budget=None, deadline=None):
+    """
+    Runs a TabuSearch or GeneticAlgorithm in a worker thread, so that the event loop stays responsive, and yields every
+    incumbent as soon as it is found. When the consumer stops early or is cancelled, the search is told to stop and the
+    step running in the worker thread is awaited before the search is closed.
+    :param search: The TabuSearch or GeneticAlgorithm.
+    :param budget: An optional number of seconds that the run may take.
+    :param deadline: An optional time.monotonic() by which the run has to stop.
+    :return: An asynchronous generator of Incumbent tuples.
+    """
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+    incumbents = search.iterate(budget, deadline, stop)
+    step = None
+    try:
+        while True:
+            step = loop.run_in_executor(None, next, incumbents, None)
+            incumbent = await asyncio.shield(step)
+            if incumbent is None:
+                break
+            yield incumbent
+    finally:
+        stop.set()
+        if step is not None and not step.done():
+            # The search checks the event between steps, so this only waits for the step that is running.
+            await asyncio.wait([step])
+        incumbents.close()
@@ -0,0 +1,143 @@
+from anytime import expired
+from bin_index import BinIndex
+from evaluation import selectors
+from heuristics import BestFit, FirstFit, NextFit, WorstFit
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+heuristic_map = {
+    "f": FirstFit,
+    "n": NextFit,
+    "w": WorstFit,
+    "b": BestFit,
+}
+heuristic_codes = {h: code for code, h in enumerate(heuristic_map)}
+# The vectorized packing scans every bin of every candidate for each item, while a BinIndex finds a bin in logarithmic
+# time, so above this many bins (estimated from the total size of the items) the candidates are packed one by one.
+MAX_VECTORIZED_BINS = 2000
+# Below this many candidates, the NumPy overhead per item outweighs what packing them together saves.
+MIN_VECTORIZED_CANDIDATES = 32
+
+
+def evaluate_batch(capacity, items, patterns, orderings=None, sizes=None, instrumentation=None, deadline=None,
+                   stop=None):
+    """
+    Packs the items once for every combination of item ordering and pattern and measures the resulting solutions.
+    All candidates are packed simultaneously when NumPy is available, there are at least MIN_VECTORIZED_CANDIDATES of
+    them and the items fill at most MAX_VECTORIZED_BINS bins, and one after the other otherwise.
+    :param capacity: The capacity of a bin.
+    :param items: The items that have to be packed in bins, or None if sizes is given.
+    :param patterns: The patterns indicating the order in which heuristics need to be applied.
+    :param orderings: Optional list of orderings of the items to pack. Defaults to only the given order of the items.
+    :param sizes: The sizes of the items instead of the items, e.g. the memory-mapped array of a Dataset. The orderings
+    are then orderings of the sizes.
+    :param instrumentation: Optional Instrumentation to record the time spent in each heuristic. When the candidates are
+    packed simultaneously, each measurement covers one heuristic for all the candidates that apply it to an item.
+    :param deadline: An optional time.monotonic() after which no more candidates are packed one after the other. The
+    first candidate is always packed, and the simultaneous packing, which is bounded by MAX_VECTORIZED_BINS, always
+    runs to the end.
+    :param stop: An optional threading.Event that has the same effect as the deadline once it is set.
+    :return: A list of (fitness, num_bins) tuples, one per candidate, with the candidates for the first ordering first.
+    Candidates that were not packed before the deadline are None.
+    """
+    if sizes is None:
+        orderings = [[item.size for item in ordering] for ordering in (orderings if orderings is not None else [items])]
+    elif orderings is None:
+        orderings = [sizes]
+    if not patterns or not orderings:
+        return []
+    if np is None or len(orderings) * len(patterns) < MIN_VECTORIZED_CANDIDATES or \
+            sum(orderings[0]) > MAX_VECTORIZED_BINS * capacity:
+        timed = instrumentation.wrap_selectors(selectors) if instrumentation else selectors
+        results = []
+        for ordering in orderings:
+            for pattern in patterns:
+                done = results and (results[-1] is None or expired(deadline, stop))
+                results.append(None if done else _evaluate(capacity, ordering, pattern, timed))
+        return results
+    return _evaluate_vectorized(capacity, orderings, patterns,
+                                instrumentation if instrumentation and instrumentation.enabled else None)
+
+
+def _evaluate(capacity, sizes, pattern, selectors=selectors):
+    """
+    Packs items of the given sizes according to a single pattern.
+    :return: (fitness, num_bins)
+    """
+    index = BinIndex(capacity)
+    index.open()
+    pattern_length = len(pattern)
+    for idx, size in enumerate(sizes):
+        position = selectors[pattern[idx % pattern_length]](index, size)
+        if position is None:
+            position = index.open()
+        index.consume(position, size)
+    return index.fitness(), len(index)
+
+
+def _evaluate_vectorized(capacity, orderings, patterns, instrumentation=None):
+    """
+    Packs all candidates at the same time, keeping one row of residual capacities per candidate. For every item, each
+    heuristic only searches the rows of the candidates that place the item with it.
+    :return: A list of (fitness, num_bins) tuples, one per candidate.
+    """
+    num_items = len(orderings[0])
+    num_rows = len(orderings) * len(patterns)
+    rows = np.arange(num_rows)
+    # The size of every item and the heuristic that places it, for every candidate.
+    sizes = np.repeat(np.array(orderings, dtype=np.int64), len(patterns), axis=0)
+    codes = np.tile(np.array([[heuristic_codes[p[idx % len(p)]] for idx in range(num_items)] for p in patterns],
+                             dtype=np.int8), (len(orderings), 1))
+    timer_names = ["selector." + selectors[letter].__name__ for letter in heuristic_map]
+    # The residual capacity of every bin, or -1 for the bins that have not been opened yet.
+    residuals = np.full((num_rows, 16), -1, dtype=np.int64)
+    residuals[:, 0] = capacity
+    num_bins = np.ones(num_rows, dtype=np.int64)
+    most_bins = 1
+    for idx in range(num_items):
+        if most_bins == residuals.shape[1]:
+            residuals = np.concatenate((residuals, np.full_like(residuals, -1)), axis=1)
+        size = sizes[:, idx]
+        position = np.empty(num_rows, dtype=np.int64)
+        code = codes[:, idx]
+        for heuristic, letter in enumerate(heuristic_map):
+            selected = np.flatnonzero(code == heuristic)
+            if not len(selected):
+                continue
+            if instrumentation is not None:
+                start_time = time.perf_counter()
+            required = size[selected]
+            if letter == "n":
+                last = num_bins[selected] - 1
+                chosen = np.where(residuals[selected, last] >= required, last, -1)
+            else:
+                candidates = residuals[selected, :most_bins]
+                if letter == "w":
+                    emptiest = candidates.argmax(axis=1)
+                    chosen = np.where(candidates[np.arange(len(selected)), emptiest] >= required, emptiest, -1)
+                else:
+                    fits = candidates >= required[:, None]
+                    if letter == "f":
+                        chosen = fits.argmax(axis=1)
+                    else:
+                        chosen = np.where(fits, candidates, capacity + 1).argmin(axis=1)
+                    chosen[~fits.any(axis=1)] = -1
+            position[selected] = chosen
+            if instrumentation is not None:
+                instrumentation.add_time(timer_names[heuristic], time.perf_counter() - start_time)
+        is_new = position < 0
+        position[is_new] = num_bins[is_new]
+        residuals[is_new, position[is_new]] = capacity
+        num_bins += is_new
+        residuals[rows, position] -= size
+        most_bins = int(num_bins.max())
+    loads = capacity - residuals
+    results = []
+    for row, count in zip(loads.tolist(), num_bins.tolist()):
+        # Summed in Python, bin by bin, so that the fitness is exactly the same as the one computed from Bin objects.
+        results.append((sum((load / capacity) ** 2 for load in row[:count]) / count, count))
+    return results
@@ -0,0 +1,167 @@
+from batch_evaluation import evaluate_batch
+from bin_index import IndexedBins
+from evaluation import Evaluator
+from genetic_algorithm import GeneticAlgorithm
+from heuristics import BestFit, FirstFit, NextFit, WorstFit
+from item import Item
+from tabu_search import TabuSearch
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+SIZES = [100, 1000, 10000]
+STYLES = ["uniform", "triplets", "hard"]
+PATTERNS = ["f", "n", "w", "b", "fnwb", "bbwf"]
+# Short benchmarks are repeated until they have run for at least this many seconds, to reduce noise.
+MIN_TIME = 0.2
+
+
+def log(message, end=None):
+    print(message, flush=True, end=end)
+
+
+def generate_instance(num_items, style, seed=0):
+    """
+    Generates a reproducible synthetic instance.
+    :param num_items: The number of items.
+    :param style: "uniform" for Falkenauer/Scholl-style sizes uniform in [20, 100] with capacity 150, "triplets" for
+    Falkenauer triplets of sizes that exactly fill a bin of capacity 1000, or "hard" for Scholl HARD-style sizes uniform in
+    [20000, 35000] with capacity 100000.
+    :param seed: The seed of the generator.
+    :return: (capacity, items)
+    """
+    rng = random.Random("{}:{}:{}".format(style, num_items, seed))
+    if style == "uniform":
+        capacity, sizes = 150, [rng.randint(20, 100) for _ in range(num_items)]
+    elif style == "hard":
+        capacity, sizes = 100000, [rng.randint(20000, 35000) for _ in range(num_items)]
+    elif style == "triplets":
+        capacity, sizes = 1000, []
+        while len(sizes) < num_items:
+            first = rng.randint(380, 490)
+            second = rng.randint(250, capacity - first - 250)
+            sizes.extend([first, second, capacity - first - second])
+        sizes = sizes[:num_items]
+        rng.shuffle(sizes)
+    else:
+        raise ValueError("Unknown instance style: {}".format(style))
+    return capacity, [Item(size=size) for size in sizes]
+
+
+def measure(function, num_items, evaluations=1, repeat=True):
+    """
+    Times a function and derives its throughput.
+    :param function: The function to time.
+    :param num_items: The number of items packed per evaluation.
+    :param evaluations: The number of evaluations the function performs, or a function that returns that number after
+    it has run.
+    :param repeat: Whether to repeat the function until it has run for at least MIN_TIME seconds.
+    :return: A dictionary with the average number of seconds per call, items per second and evaluations per second.
+    """
+    calls = 0
+    start_time = time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start_time
+        if not repeat or elapsed >= MIN_TIME:
+            break
+    seconds = elapsed / calls
+    if callable(evaluations):
+        evaluations = evaluations()
+    return {
+        "seconds": seconds,
+        "items_per_sec": num_items * evaluations / seconds,
+        "evaluations_per_sec": evaluations / seconds,
+    }
+
+
+def pack(heuristic, capacity, items):
+    bins = IndexedBins(capacity)
+    for item in items:
+        bins = heuristic.apply(item, bins)
+    return bins
+
+
+def run_suite(sizes, styles, full_run_limit):
+    """
+    Times the low-level heuristics, solution generation, the evaluation engines and full searches on synthetic instances.
+    :param sizes: The numbers of items to generate instances with.
+    :param styles: The styles of the instances.
+    :param full_run_limit: The largest number of items to time full GA and tabu search runs on.
+    :return: A dictionary mapping "style/num_items/benchmark" to measurements.
+    """
+    results = {}
+    for style in styles:
+        for num_items in sizes:
+            capacity, items = generate_instance(num_items, style)
+            prefix = "{}/{}/".format(style, num_items)
+            for h in [FirstFit, NextFit, WorstFit, BestFit]:
+                results[prefix + h.__name__] = measure(lambda: pack(h, capacity, items), num_items)
+            thing = TabuSearch(capacity, items)
+            results[prefix + "generate_solution"] = measure(
+                lambda: [thing.generate_solution(p) for p in PATTERNS], num_items, len(PATTERNS))
+            results[prefix + "Evaluator"] = measure(
+                lambda: [Evaluator(capacity, items).evaluate(p) for p in PATTERNS], num_items, len(PATTERNS))
+            results[prefix + "evaluate_batch"] = measure(
+                lambda: evaluate_batch(capacity, items, PATTERNS), num_items, len(PATTERNS))
+            if num_items <= full_run_limit:
+                # Full runs are seeded and timed once. Their evaluations are the patterns that were actually packed.
+                random.seed(0)
+                tabu = TabuSearch(capacity, items)
+                results[prefix + "TabuSearch"] = measure(tabu.run, num_items, lambda: tabu.cache.misses, repeat=False)
+                random.seed(0)
+                ga = GeneticAlgorithm(capacity, items)
+                results[prefix + "GA"] = measure(ga.run, num_items, lambda: ga.cache.misses, repeat=False)
+            for name, measurement in results.items():
+                if name.startswith(prefix):
+                    log("{:<36} {:>10.4f} s {:>14.0f} items/s {:>10.1f} evaluations/s".format(
+                        name, measurement["seconds"], measurement["items_per_sec"], measurement["evaluations_per_sec"]))
+    return results
+
+
+def compare(baseline, results, tolerance):
+    """
+    Compares the throughput of a run with a baseline.
+    :param baseline: The results of the baseline run.
+    :param results: The results of the current run.
+    :param tolerance: The relative slowdown that is still accepted.
+    :return: The names of the benchmarks that regressed.
+    """
+    regressions = []
+    for name, measurement in results.items():
+        if name not in baseline:
+            continue
+        ratio = measurement["items_per_sec"] / baseline[name]["items_per_sec"]
+        regressed = ratio < 1 - tolerance
+        if regressed:
+            regressions.append(name)
+        log("{:<36} {:>6.2f}x{}".format(name, ratio, "  REGRESSION" if regressed else ""))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Times the heuristics and search algorithms on synthetic instances.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--styles", nargs="+", choices=STYLES, default=STYLES)
+    parser.add_argument("--full-run-limit", type=int, default=1000)
+    parser.add_argument("--save", help="Write the results to this baseline file.")
+    parser.add_argument("--compare", help="Compare the results with this baseline file.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    results = run_suite(args.sizes, args.styles, args.full_run_limit)
+    if args.save:
+        with open(args.save, "w") as file:
+            file.write(json.dumps({
+                "python": sys.version,
+                "platform": platform.platform(),
+                "results": results,
+            }, indent=2))
+    if args.compare:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)["results"]
+        if compare(baseline, results, args.tolerance):
+            sys.exit(1)
@@ -1,7 +1,11 @@
 class Bin:
+    __slots__ = ("capacity", "items", "load")
+
     def __init__(self, capacity):
         self.capacity = capacity
         self.items = []
+        # Running total of the sizes of the items in the bin, so that the load does not have to be recomputed.
+        self.load = 0
 
     def add_item(self, new_item):
         """
@@ -11,6 +15,7 @@ class Bin:
         """
         if self.can_add_item(new_item):
             self.items.append(new_item)
+            self.load += new_item.size
             return True
         return False
 
@@ -20,25 +25,25 @@ class Bin:
         :param new_item: The item to check.
         :return: True if the item can be added, False otherwise.
         """
-        return new_item.size <= self.open_space()
+        return new_item.size <= self.capacity - self.load
 
     def filled_space(self):
         """
         Gets the amount of space currently in use by items in the bin.
         :return: The amount of space currently in use.
         """
-        return sum(item.size for item in self.items)
+        return self.load
 
     def open_space(self):
         """
         Gets the amount of space that is still available in this bin.
         :return: The amount of space that this bin has left.
         """
-        return self.capacity - self.filled_space()
+        return self.capacity - self.load
 
     def fitness(self):
         """
         Returns a value that can be used to indicate the fitness of this bin when calculating the fitness of a solution.
         :return: (fullness / capacity) ^ 2
         """
-        return (self.filled_space() / self.capacity) ** 2
+        return (self.load / self.capacity) ** 2
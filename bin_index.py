@@ -0,0 +1,389 @@
+from heapq import heapify, heappop, heappush
+from bin import Bin
+
+
+class ResidualTree:
+    def __init__(self):
+        """
+        Creates a segment tree that keeps track of the largest residual capacity over ranges of bins. Leaves that do not
+        correspond to a bin hold -1, so that they can never be chosen.
+        """
+        self.size = 1
+        self.tree = [-1, -1]
+
+    def set(self, position, residual):
+        """
+        Updates the residual capacity of the bin at the given position.
+        :param position: The position of the bin in the list of bins.
+        :param residual: The new residual capacity of the bin.
+        """
+        if position >= self.size:
+            self._grow(position)
+        tree = self.tree
+        i = position + self.size
+        tree[i] = residual
+        i >>= 1
+        while i:
+            best = tree[2 * i] if tree[2 * i] >= tree[2 * i + 1] else tree[2 * i + 1]
+            if tree[i] == best:
+                break
+            tree[i] = best
+            i >>= 1
+
+    def copy(self):
+        """
+        Creates an independent copy of the tree.
+        :return: The copy.
+        """
+        clone = ResidualTree.__new__(ResidualTree)
+        clone.size = self.size
+        clone.tree = self.tree[:]
+        return clone
+
+    @staticmethod
+    def build(residuals):
+        """
+        Creates a tree for the given residual capacities in O(n) time.
+        :param residuals: The residual capacities of the bins, in order.
+        :return: The tree.
+        """
+        tree = ResidualTree()
+        size = 1
+        while size < len(residuals):
+            size *= 2
+        nodes = [-1] * size + list(residuals) + [-1] * (size - len(residuals))
+        for i in range(size - 1, 0, -1):
+            nodes[i] = nodes[2 * i] if nodes[2 * i] >= nodes[2 * i + 1] else nodes[2 * i + 1]
+        tree.size = size
+        tree.tree = nodes
+        return tree
+
+    def leftmost_at_least(self, value):
+        """
+        Finds the first bin that has a residual capacity of at least the given value.
+        :param value: The required residual capacity.
+        :return: The position of the bin, or None if no bin has enough residual capacity.
+        """
+        tree = self.tree
+        if tree[1] < value:
+            return None
+        i = 1
+        while i < self.size:
+            i *= 2
+            if tree[i] < value:
+                i += 1
+        return i - self.size
+
+    def _grow(self, position):
+        """
+        Doubles the number of leaves until the given position fits and rebuilds the internal nodes.
+        :param position: The position that has to fit in the tree.
+        """
+        size = self.size
+        while size <= position:
+            size *= 2
+        leaves = self.tree[self.size:]
+        tree = [-1] * size + leaves + [-1] * (size - len(leaves))
+        for i in range(size - 1, 0, -1):
+            tree[i] = max(tree[2 * i], tree[2 * i + 1])
+        self.size = size
+        self.tree = tree
+
+
+class ResidualOrder:
+    # Buckets are cleared of positions that have moved on whenever they grow to a power of two at least this large.
+    MIN_CLEANUP = 32
+
+    def __init__(self, capacity):
+        """
+        Keeps track of which residual capacities occur among the bins in a tree of 64-bit words over the values
+        0..capacity, in which bit b of word w at one level is set if word 64 * w + b at the level below is not zero, and
+        of the bins with each residual capacity in a heap of their positions. The tightest bin that fits an item is then
+        found in O(log capacity) time, with at most three levels for the capacities in use, however many bins there are.
+        :param capacity: The capacity of a bin.
+        """
+        self.levels = []
+        num_words = (capacity >> 6) + 1
+        while True:
+            self.levels.append([0] * num_words)
+            if num_words == 1:
+                break
+            num_words = ((num_words - 1) >> 6) + 1
+        # The residual capacity every bin is registered with, or -1 if it is not in the ordering.
+        self.registered = []
+        # Maps a residual capacity to a heap of the positions of the bins that have it. Positions that have moved on
+        # are only dropped when they reach the top, or when the heap is cleaned up.
+        self.buckets = {}
+
+    def set(self, position, residual):
+        """
+        Registers the residual capacity of a bin. Residual capacities only ever decrease, except when a bin is added.
+        :param position: The position of the bin in the list of bins.
+        :param residual: The residual capacity of the bin, or -1 to leave it out of the ordering.
+        """
+        registered = self.registered
+        if position >= len(registered):
+            registered.extend([-1] * (position + 1 - len(registered)))
+        old_residual = registered[position]
+        if old_residual == residual:
+            return
+        registered[position] = residual
+        buckets = self.buckets
+        if old_residual >= 0:
+            bucket = buckets[old_residual]
+            if bucket[0] == position:
+                heappop(bucket)
+                while bucket and registered[bucket[0]] != old_residual:
+                    heappop(bucket)
+                if not bucket:
+                    del buckets[old_residual]
+                    value = old_residual
+                    for words in self.levels:
+                        word = words[value >> 6] & ~(1 << (value & 63))
+                        words[value >> 6] = word
+                        if word:
+                            break
+                        value >>= 6
+        if residual >= 0:
+            bucket = buckets.get(residual)
+            if bucket is None:
+                buckets[residual] = [position]
+                value = residual
+                for words in self.levels:
+                    word = words[value >> 6]
+                    words[value >> 6] = word | (1 << (value & 63))
+                    if word:
+                        break
+                    value >>= 6
+            else:
+                heappush(bucket, position)
+                size = len(bucket)
+                if size >= self.MIN_CLEANUP and not size & (size - 1):
+                    bucket[:] = [p for p in bucket if registered[p] == residual]
+                    heapify(bucket)
+
+    def copy(self):
+        """
+        Creates an independent copy of the ordering.
+        :return: The copy.
+        """
+        clone = ResidualOrder.__new__(ResidualOrder)
+        clone.levels = [words[:] for words in self.levels]
+        clone.registered = self.registered[:]
+        clone.buckets = {residual: bucket[:] for residual, bucket in self.buckets.items()}
+        return clone
+
+    def smallest_at_least(self, value):
+        """
+        Finds the bin with the smallest residual capacity that is at least the given value. Ties are broken in favour
+        of the first bin.
+        :param value: The required residual capacity.
+        :return: The position of the bin, or None if no bin has enough residual capacity.
+        """
+        levels = self.levels
+        value = max(value, 0)
+        depth = 0
+        # Climb until a word has a set bit at or after the value, then descend along the lowest set bits.
+        for words in levels:
+            if value >> 6 >= len(words):
+                return None
+            word = words[value >> 6] & (-1 << (value & 63))
+            if word:
+                value = (value & ~63) | ((word & -word).bit_length() - 1)
+                while depth:
+                    depth -= 1
+                    word = levels[depth][value]
+                    value = (value << 6) | ((word & -word).bit_length() - 1)
+                return self.buckets[value][0]
+            value = (value >> 6) + 1
+            depth += 1
+        return None
+
+
+class BinIndex:
+    def __init__(self, capacity):
+        """
+        Creates an index over the residual capacities of a list of bins that answers heuristic queries without scanning
+        every bin.
+        :param capacity: The capacity of a bin.
+        """
+        self.capacity = capacity
+        self.residuals = []
+        self.tree = ResidualTree()
+        self.order = ResidualOrder(capacity)
+        # The positions of the bins whose residual capacity has changed since the ordering and the tree were last brought
+        # up to date. They are only brought up to date by the heuristics that need them, so a pattern that never uses
+        # best_fit does not maintain the ordering, and an item that goes into the same bin as the previous one costs
+        # nothing extra.
+        self.order_changed = set()
+        self.tree_changed = set()
+
+    def __len__(self):
+        return len(self.residuals)
+
+    def copy(self):
+        """
+        Creates an independent copy of the index, e.g. to take a snapshot of a partial packing.
+        :return: The copy.
+        """
+        clone = BinIndex.__new__(BinIndex)
+        clone.capacity = self.capacity
+        clone.residuals = self.residuals[:]
+        clone.tree = self.tree.copy()
+        clone.order = self.order.copy()
+        clone.order_changed = set(self.order_changed)
+        clone.tree_changed = set(self.tree_changed)
+        return clone
+
+    @staticmethod
+    def from_residuals(capacity, residuals):
+        """
+        Creates an index over bins with the given residual capacities, e.g. from a snapshot that only kept the residual
+        capacities of a partial packing. Bins with a residual capacity of -1 are closed.
+        :param capacity: The capacity of a bin.
+        :param residuals: The residual capacities of the bins, in order.
+        :return: The index.
+        """
+        index = BinIndex(capacity)
+        index._load(residuals)
+        return index
+
+    def compact(self, positions):
+        """
+        Drops every bin except the ones at the given positions, which keep their relative order, so that the heuristics
+        make the same choices among them. The bin at positions[i] moves to position i.
+        :param positions: The positions of the bins to keep, in increasing order.
+        """
+        self._load([self.residuals[position] for position in positions])
+
+    def _load(self, residuals):
+        self.residuals = list(residuals)
+        self.tree = ResidualTree.build(self.residuals)
+        self.order = ResidualOrder(self.capacity)
+        self.order_changed = set(range(len(self.residuals)))
+        self.tree_changed = set()
+
+    def _update_order(self):
+        residuals = self.residuals
+        order = self.order
+        for position in self.order_changed:
+            order.set(position, residuals[position])
+        self.order_changed.clear()
+
+    def _update_tree(self):
+        residuals = self.residuals
+        tree = self.tree
+        for position in self.tree_changed:
+            tree.set(position, residuals[position])
+        self.tree_changed.clear()
+
+    def fitness(self):
+        """
+        Calculates the fitness of the packing, exactly as it would be calculated from the equivalent Bin objects.
+        :return: The average of (fullness / capacity) ^ 2 over all bins.
+        """
+        capacity = self.capacity
+        return sum(((capacity - r) / capacity) ** 2 for r in self.residuals) / len(self.residuals)
+
+    def open(self):
+        """
+        Registers a new, empty bin at the end of the list of bins.
+        :return: The position of the new bin.
+        """
+        position = len(self.residuals)
+        self.residuals.append(self.capacity)
+        self.tree_changed.add(position)
+        self.order_changed.add(position)
+        return position
+
+    def consume(self, position, size):
+        """
+        Registers that an item has been added to the bin at the given position.
+        :param position: The position of the bin.
+        :param size: The size of the item that was added.
+        """
+        residual = self.residuals[position] - size
+        self.residuals[position] = residual
+        self.tree_changed.add(position)
+        self.order_changed.add(position)
+
+    def close(self, position):
+        """
+        Closes the bin at the given position, so that the heuristics never choose it again. Its residual capacity is
+        registered as -1, like the unused leaves of the tree, and it is left out of the ordering, so fitness() is only
+        meaningful while every bin is open.
+        :param position: The position of the bin.
+        """
+        self.residuals[position] = -1
+        self.tree_changed.add(position)
+        self.order_changed.add(position)
+
+    def first_fit(self, size):
+        """
+        Finds the first bin that can fit an item of the given size.
+        :param size: The size of the item.
+        :return: The position of the bin, or None if a new bin has to be opened.
+        """
+        if self.tree_changed:
+            self._update_tree()
+        return self.tree.leftmost_at_least(size)
+
+    def next_fit(self, size):
+        """
+        Checks whether the last bin can fit an item of the given size.
+        :param size: The size of the item.
+        :return: The position of the last bin, or None if a new bin has to be opened.
+        """
+        last = len(self.residuals) - 1
+        return last if self.residuals[last] >= size else None
+
+    def best_fit(self, size):
+        """
+        Finds the bin with the least residual capacity that can still fit an item of the given size. Ties are broken in
+        favour of the first bin.
+        :param size: The size of the item.
+        :return: The position of the bin, or None if a new bin has to be opened.
+        """
+        if self.order_changed:
+            self._update_order()
+        return self.order.smallest_at_least(size)
+
+    def worst_fit(self, size):
+        """
+        Finds the bin with the most residual capacity if it can fit an item of the given size. Ties are broken in favour
+        of the first bin.
+        :param size: The size of the item.
+        :return: The position of the bin, or None if a new bin has to be opened.
+        """
+        if self.tree_changed:
+            self._update_tree()
+        largest = self.tree.tree[1]
+        return self.tree.leftmost_at_least(largest) if largest >= size else None
+
+
+class IndexedBins(list):
+    def __init__(self, capacity):
+        """
+        Creates a list of bins, starting with a single empty bin, that keeps a BinIndex up to date so that the
+        heuristics can pick a bin without scanning the whole list.
+        :param capacity: The capacity of a bin.
+        """
+        super().__init__()
+        self.capacity = capacity
+        self.index = BinIndex(capacity)
+        self.index.open()
+        self.append(Bin(capacity))
+
+    def place(self, position, item):
+        """
+        Adds an item to the bin at the given position, opening a new bin if no position is given.
+        :param position: The position of the bin, or None to open a new bin.
+        :param item: The item to add.
+        :return: The list of bins after the insertion.
+        """
+        if position is None:
+            position = self.index.open()
+            self.append(Bin(self.capacity))
+        self[position].add_item(item)
+        self.index.consume(position, item.size)
+        return self
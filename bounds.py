@@ -0,0 +1,43 @@
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+
+def lower_bound_l1(capacity, sizes):
+    """
+    Computes the continuous lower bound L1 on the number of bins: the total size of the items divided by the capacity,
+    rounded up.
+    :param capacity: The capacity of a bin.
+    :param sizes: The sizes of the items.
+    :return: The lower bound.
+    """
+    return max(1, -(-sum(sizes) // capacity))
+
+
+def lower_bound_l2(capacity, sizes):
+    """
+    Computes the Martello-Toth lower bound L2 on the number of bins. For every threshold alpha in [0, capacity / 2], the
+    items larger than capacity - alpha and the items larger than capacity / 2 each need a bin of their own, and the
+    items of size at least alpha that are not larger than capacity / 2 need to be packed into whatever space the latter
+    leave open, or into additional bins.
+    :param capacity: The capacity of a bin.
+    :param sizes: The sizes of the items.
+    :return: The lower bound, which is never smaller than L1.
+    """
+    ordered = sorted(sizes)
+    totals = [0] + list(accumulate(ordered))
+    n = len(ordered)
+    # Position of the first item larger than capacity / 2.
+    large = bisect_right(ordered, capacity // 2)
+    best = lower_bound_l1(capacity, sizes)
+    for alpha in set([0] + ordered[:large]):
+        # N1: items larger than capacity - alpha. N2: the remaining items larger than capacity / 2.
+        # N3: items of size in [alpha, capacity / 2].
+        n1_start = bisect_right(ordered, capacity - alpha)
+        n3_start = bisect_left(ordered, alpha)
+        n2_count = n1_start - large
+        n2_total = totals[n1_start] - totals[large]
+        n3_total = totals[large] - totals[n3_start]
+        overflow = n3_total - (n2_count * capacity - n2_total)
+        bound = (n - n1_start) + n2_count + max(0, -(-overflow // capacity))
+        best = max(best, bound)
+    return best
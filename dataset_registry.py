@@ -0,0 +1,165 @@
+from array import array
+from bounds import lower_bound_l1, lower_bound_l2
+from item import Item
+import hashlib
+import json
+import mmap
+import os
+
+DATASET_DIR = "datasets"
+CACHE_DIR = ".dataset_cache"
+EXTENSION = ".BPP"
+
+
+def parse_bpp(contents):
+    """
+    Parses the contents of a .BPP file: the number of items, the capacity of a bin and the size of every item.
+    :param contents: The contents of the file, as bytes or str.
+    :return: (capacity, sizes) where sizes is an array of 64-bit integers.
+    """
+    values = contents.split()
+    return int(values[1]), array("q", map(int, values[2:]))
+
+
+def _write_atomic(path, data):
+    """
+    Writes a file so that readers either see the old contents or the complete new contents.
+    """
+    temporary = "{}.{}.tmp".format(path, os.getpid())
+    with open(temporary, "wb") as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+
+class Dataset:
+    def __init__(self, name, path, metadata, cache_dir):
+        """
+        Describes a data set whose items have been converted to a binary cache file.
+        :param name: The file name of the data set.
+        :param path: The path of the original .BPP file.
+        :param metadata: A dictionary with the content hash, the number of items, the capacity and the lower bounds.
+        :param cache_dir: The directory that holds the binary cache.
+        """
+        self.name = name
+        self.path = path
+        self.metadata = metadata
+        self.cache_path = os.path.join(cache_dir, metadata["hash"] + ".bin")
+        self._sizes = None
+
+    @property
+    def num_items(self):
+        return self.metadata["num_items"]
+
+    @property
+    def capacity(self):
+        return self.metadata["capacity"]
+
+    @property
+    def lower_bound(self):
+        return self.metadata["l2"]
+
+    @property
+    def sizes(self):
+        """
+        The sizes of the items as a read-only, memory-mapped array of 64-bit integers. The pages are shared between all
+        processes that map the same data set, so workers do not hold their own copy.
+        :return: A memoryview of the sizes.
+        """
+        if self._sizes is None:
+            with open(self.cache_path, "rb") as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    self._sizes = memoryview(b"").cast("q")
+                else:
+                    self._sizes = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)).cast("q")
+        return self._sizes
+
+    def items(self):
+        """
+        Creates an Item for every item in the data set, for the code that works with Item objects.
+        :return: The list of items.
+        """
+        return [Item(size=size) for size in self.sizes]
+
+
+class DatasetRegistry:
+    def __init__(self, dataset_dir=DATASET_DIR, cache_dir=CACHE_DIR):
+        """
+        Creates a registry of every data set in a directory. Each data set is parsed once and stored in a binary cache
+        keyed by the hash of its contents, together with its metadata. Files are only hashed again when their size or
+        modification time changes.
+        :param dataset_dir: The directory that holds the .BPP files.
+        :param cache_dir: The directory to keep the binary cache in.
+        """
+        self.dataset_dir = dataset_dir
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self._datasets = {}
+
+    def names(self):
+        """
+        Discovers the data sets in the data set directory.
+        :return: The sorted file names of the data sets.
+        """
+        return sorted(name for name in os.listdir(self.dataset_dir) if name.upper().endswith(EXTENSION))
+
+    def get(self, name):
+        """
+        Gets a data set, converting it to the binary cache first if necessary.
+        :param name: The file name of the data set.
+        :return: The Dataset.
+        """
+        if name not in self._datasets:
+            self._datasets[name] = self._load(name)
+        return self._datasets[name]
+
+    def __iter__(self):
+        return (self.get(name) for name in self.names())
+
+    def _load(self, name):
+        path = os.path.join(self.dataset_dir, name)
+        stat = os.stat(path)
+        index = self._read_index()
+        entry = index.get(name)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            metadata_path = os.path.join(self.cache_dir, entry["hash"] + ".json")
+            if os.path.exists(metadata_path):
+                with open(metadata_path, "r") as file:
+                    return Dataset(name, path, json.load(file), self.cache_dir)
+        with open(path, "rb") as file:
+            contents = file.read()
+        metadata = self._convert(contents)
+        index = self._read_index()
+        index[name] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": metadata["hash"]}
+        _write_atomic(self.index_path, json.dumps(index, indent=2).encode())
+        return Dataset(name, path, metadata, self.cache_dir)
+
+    def _convert(self, contents):
+        """
+        Parses the contents of a .BPP file and writes its items and metadata to the cache, unless a file with the same
+        contents has been converted before.
+        :return: The metadata.
+        """
+        content_hash = hashlib.blake2b(contents, digest_size=16).hexdigest()
+        metadata_path = os.path.join(self.cache_dir, content_hash + ".json")
+        if os.path.exists(metadata_path):
+            with open(metadata_path, "r") as file:
+                return json.load(file)
+        capacity, sizes = parse_bpp(contents)
+        metadata = {
+            "hash": content_hash,
+            "num_items": len(sizes),
+            "capacity": capacity,
+            "l1": lower_bound_l1(capacity, sizes),
+            "l2": lower_bound_l2(capacity, sizes),
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _write_atomic(os.path.join(self.cache_dir, content_hash + ".bin"), sizes.tobytes())
+        # The metadata is written last, so that its presence means the cache entry is complete.
+        _write_atomic(metadata_path, json.dumps(metadata).encode())
+        return metadata
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, "r") as file:
+            return json.load(file)
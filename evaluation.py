@@ -0,0 +1,178 @@
+from array import array
+from bin_index import BinIndex
+from collections import OrderedDict
+from math import ceil, gcd
+
+selectors = {
+    "f": BinIndex.first_fit,
+    "n": BinIndex.next_fit,
+    "w": BinIndex.worst_fit,
+    "b": BinIndex.best_fit,
+}
+
+
+def first_divergence(old_pattern, new_pattern, num_items):
+    """
+    Finds the index of the first item for which two patterns select a different heuristic.
+    :param old_pattern: The first pattern.
+    :param new_pattern: The second pattern.
+    :param num_items: The number of items that are packed.
+    :return: The index of the first item that is packed differently, or num_items if the packings are identical.
+    """
+    old_length, new_length = len(old_pattern), len(new_pattern)
+    # By the theorem of Fine and Wilf, two periodic sequences that agree on their first
+    # old_length + new_length - gcd(old_length, new_length) elements agree everywhere.
+    limit = min(num_items, old_length + new_length - gcd(old_length, new_length))
+    for idx in range(limit):
+        if old_pattern[idx % old_length] != new_pattern[idx % new_length]:
+            return idx
+    return num_items
+
+
+class Evaluator:
+    CHECKPOINT_INTERVAL = 16
+    MEMORY_BUDGET = 1000000
+
+    def __init__(self, capacity, items=None, checkpoint_interval=None, memory_budget=None, instrumentation=None,
+                 sizes=None):
+        """
+        Creates an engine that evaluates patterns on residual capacities only. The residual capacities are snapshotted
+        at regular intervals, so that a pattern derived from one that was evaluated before only has to be packed from
+        the last snapshot before the point where the two patterns diverge. Two patterns always diverge within the sum of
+        their lengths, so snapshots are only taken up to the length of the pattern plus twice the length of the longest
+        pattern evaluated so far.
+        :param capacity: The capacity of a bin.
+        :param items: The items that have to be packed in bins, or None if sizes is given.
+        :param checkpoint_interval: The number of items packed between two snapshots.
+        :param memory_budget: The maximum number of residual capacities held across all snapshots, where every stored
+        pattern counts as one more. An evaluation stops taking snapshots once its own would exceed the budget.
+        :param instrumentation: Optional Instrumentation to record the time spent in each heuristic.
+        :param sizes: The sizes of the items instead of the items, e.g. the memory-mapped array of a Dataset. The sizes
+        are not copied.
+        """
+        self.capacity = capacity
+        self.sizes = sizes if sizes is not None else array("q", (item.size for item in items))
+        self.selectors = instrumentation.wrap_selectors(selectors) if instrumentation else selectors
+        self.checkpoint_interval = checkpoint_interval or self.CHECKPOINT_INTERVAL
+        self.memory_budget = memory_budget if memory_budget is not None else self.MEMORY_BUDGET
+        # Maps a pattern to ([(item index, snapshot), ...], (fitness, num_bins)), least recently used first.
+        self.checkpoints = OrderedDict()
+        self.memory_used = 0
+        self.longest_pattern = 0
+        self.items_packed = 0
+        self.items_skipped = 0
+        self.items_aborted = 0
+        self.evaluations_aborted = 0
+        # The best fitness any packing can reach is when every bin but one is completely full.
+        full_bins, remainder = divmod(sum(self.sizes), capacity)
+        self.max_fullness = full_bins + (remainder / capacity) ** 2
+
+    def evaluate(self, pattern, base=None, threshold=None):
+        """
+        Evaluates a pattern, resuming from the snapshots of the base pattern if they are still available.
+        :param pattern: The pattern to evaluate.
+        :param base: An optional pattern, evaluated before, that the new pattern was derived from.
+        :param threshold: An optional fitness that the pattern has to beat. Packing is aborted as soon as the number of
+        open bins proves that the fitness of the pattern cannot be greater than the threshold.
+        :return: (fitness, num_bins), or None if the evaluation was aborted.
+        """
+        num_items = len(self.sizes)
+        self.longest_pattern = max(self.longest_pattern, len(pattern))
+        snapshots = []
+        index = None
+        stored = self.checkpoints.get(base) if base is not None else None
+        if stored is not None:
+            self.checkpoints.move_to_end(base)
+            base_snapshots, result = stored
+            divergence = first_divergence(base, pattern, num_items)
+            if divergence == num_items:
+                self.items_skipped += num_items
+                return result
+            snapshots = [(position, snapshot) for position, snapshot in base_snapshots if position <= divergence]
+        if snapshots:
+            start = snapshots[-1][0]
+            index = BinIndex.from_residuals(self.capacity, snapshots[-1][1])
+        else:
+            start = 0
+            index = BinIndex(self.capacity)
+            index.open()
+        self.items_skipped += start
+        abort_bins = self.abort_bins(threshold)
+        if len(index) >= abort_bins:
+            return self._abort(num_items - start)
+        sizes, selectors = self.sizes, self.selectors
+        pattern_length = len(pattern)
+        interval = self.checkpoint_interval
+        horizon = min(num_items, pattern_length + 2 * self.longest_pattern)
+        memory_left = self.memory_budget - self._memory(snapshots)
+        next_snapshot = (start // interval + 1) * interval
+        for idx in range(start, num_items):
+            if idx == next_snapshot:
+                memory_left -= len(index)
+                if idx < horizon and memory_left >= 0:
+                    snapshots.append((idx, index.residuals[:]))
+                    next_snapshot += interval
+            size = sizes[idx]
+            position = selectors[pattern[idx % pattern_length]](index, size)
+            if position is None:
+                position = index.open()
+                if len(index) >= abort_bins:
+                    self.items_packed += idx + 1 - start
+                    return self._abort(num_items - idx - 1)
+            index.consume(position, size)
+        self.items_packed += num_items - start
+        result = index.fitness(), len(index)
+        self._store(pattern, snapshots, result)
+        return result
+
+    def abort_bins(self, threshold):
+        """
+        Calculates the number of bins at which a packing can no longer have a fitness greater than the threshold. With
+        k bins the fitness is at most max_fullness / k, and bins are never closed. A small margin keeps the decision
+        identical to comparing the fully computed, rounded fitness with the threshold.
+        :param threshold: The fitness to beat, or None.
+        :return: The number of bins, or infinity if the evaluation should never be aborted.
+        """
+        if threshold is None or threshold <= 0:
+            return float("inf")
+        return max(1, ceil(self.max_fullness * (1 + 1e-9) / threshold))
+
+    def _abort(self, remaining):
+        """
+        Records that an evaluation was aborted with the given number of items left to pack.
+        :return: None
+        """
+        self.items_aborted += remaining
+        self.evaluations_aborted += 1
+        return None
+
+    def stats(self):
+        """
+        Summarises how much packing work the engine has done and avoided.
+        :return: A dictionary of counters.
+        """
+        return {
+            "items_packed": self.items_packed,
+            "items_skipped": self.items_skipped,
+            "items_aborted": self.items_aborted,
+            "evaluations_aborted": self.evaluations_aborted,
+        }
+
+    def _store(self, pattern, snapshots, result):
+        """
+        Keeps the snapshots of a pattern, discarding the least recently used ones when the memory budget is exceeded.
+        """
+        if pattern in self.checkpoints:
+            self.memory_used -= self._memory(self.checkpoints.pop(pattern)[0])
+        self.checkpoints[pattern] = (snapshots, result)
+        self.memory_used += self._memory(snapshots)
+        while self.memory_used > self.memory_budget and len(self.checkpoints) > 1:
+            self.memory_used -= self._memory(self.checkpoints.popitem(last=False)[1][0])
+
+    @staticmethod
+    def _memory(snapshots):
+        """
+        Measures the size of the snapshots of a pattern as the number of residual capacities they hold, plus one for the
+        pattern itself.
+        """
+        return 1 + sum(len(snapshot) for _, snapshot in snapshots)
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import time
+
+
+class EvaluationStore:
+    MAX_ENTRIES = 1000000
+    # The number of new evaluations that are buffered before they are written in one transaction.
+    FLUSH_SIZE = 256
+
+    def __init__(self, path, max_entries=None):
+        """
+        Creates a persistent store of evaluations in an SQLite database, shared by every run and process that opens the
+        same file. The database uses write-ahead logging, so readers never block the single writer. When it holds more
+        than max_entries evaluations, the oldest ones are evicted.
+        :param path: The path of the database file.
+        :param max_entries: The maximum number of evaluations to keep.
+        """
+        self.path = path
+        self.max_entries = max_entries or self.MAX_ENTRIES
+        self.pending = []
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self):
+        # SQLite connections cannot be shared with forked processes, so every process opens its own.
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._pid = os.getpid()
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            with self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS evaluations (fingerprint TEXT, pattern TEXT, fitness REAL, "
+                    "num_bins INTEGER, created REAL, PRIMARY KEY (fingerprint, pattern)) WITHOUT ROWID")
+                self._connection.execute("CREATE INDEX IF NOT EXISTS evaluations_created ON evaluations (created)")
+        return self._connection
+
+    def get(self, key):
+        """
+        Looks up the evaluation of a pattern.
+        :param key: The (item fingerprint, canonical pattern) key.
+        :return: (fitness, num_bins), or None if the pattern has not been evaluated yet.
+        """
+        row = self.connection.execute("SELECT fitness, num_bins FROM evaluations WHERE fingerprint = ? AND pattern = ?",
+                                      key).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row
+
+    def put(self, key, result):
+        """
+        Buffers the evaluation of a pattern, writing the buffer once it is full.
+        :param key: The (item fingerprint, canonical pattern) key.
+        :param result: (fitness, num_bins)
+        """
+        self.pending.append((key[0], key[1], result[0], result[1], time.time()))
+        if len(self.pending) >= self.FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered evaluations and evicts the oldest evaluations if the store has grown too large.
+        """
+        if not self.pending:
+            return
+        connection = self.connection
+        with connection:
+            connection.executemany("INSERT OR IGNORE INTO evaluations VALUES (?, ?, ?, ?, ?)", self.pending)
+            excess = connection.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0] - self.max_entries
+            if excess > 0:
+                connection.execute("DELETE FROM evaluations WHERE (fingerprint, pattern) IN (SELECT fingerprint, "
+                                   "pattern FROM evaluations ORDER BY created LIMIT ?)", (excess,))
+        self.pending = []
+
+    def close(self):
+        """
+        Writes the buffered evaluations and closes the database.
+        """
+        self.flush()
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+        self._pid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
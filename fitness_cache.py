@@ -0,0 +1,101 @@
+from array import array
+from collections import OrderedDict
+import hashlib
+
+
+def canonical_pattern(pattern, num_items=None):
+    """
+    Reduces a pattern to the shortest pattern that produces the same packing. A pattern is applied cyclically, so any
+    repetition of a shorter period (e.g. "fnfn" and "fn") gives exactly the same sequence of heuristics.
+    :param pattern: The pattern to reduce.
+    :param num_items: The number of items that will be packed. Characters beyond this point are never used.
+    :return: The canonical pattern.
+    """
+    if num_items:
+        pattern = pattern[:num_items]
+    length = len(pattern)
+    for period in range(1, length // 2 + 1):
+        if length % period == 0 and pattern[:period] * (length // period) == pattern:
+            return pattern[:period]
+    return pattern
+
+
+def item_fingerprint(capacity, sizes):
+    """
+    Computes a fingerprint that identifies a bin capacity together with an ordering of items.
+    :param capacity: The capacity of a bin.
+    :param sizes: The sizes of the items in the order in which they are packed.
+    :return: A hexadecimal digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(array('q', [capacity]).tobytes() + array('q', sizes).tobytes())
+    return digest.hexdigest()
+
+
+class FitnessCache:
+    def __init__(self, max_size=10000, store=None):
+        """
+        Creates a bounded cache that maps (item fingerprint, canonical pattern) keys to (fitness, num_bins) tuples and
+        discards the least recently used entries when it is full.
+        :param max_size: The maximum number of entries to keep.
+        :param store: An optional EvaluationStore that is consulted on a miss and receives every new evaluation, so that
+        evaluations are shared with other runs and processes.
+        """
+        self.max_size = max_size
+        self.store = store
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Looks up the evaluation of a pattern.
+        :param key: The (item fingerprint, canonical pattern) key.
+        :return: (fitness, num_bins), or None if the pattern has not been evaluated yet.
+        """
+        result = self.entries.get(key)
+        if result is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return result
+        if self.store is not None:
+            result = self.store.get(key)
+            if result is not None:
+                self.hits += 1
+                self._add(key, result)
+                return result
+        self.misses += 1
+        return None
+
+    def put(self, key, result):
+        """
+        Stores the evaluation of a pattern.
+        :param key: The (item fingerprint, canonical pattern) key.
+        :param result: (fitness, num_bins)
+        """
+        if self.store is not None and key not in self.entries:
+            self.store.put(key, result)
+        self._add(key, result)
+
+    def _add(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Summarises how effective the cache has been.
+        :return: A dictionary with the number of hits, misses, entries and the hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "store_hits": self.store.hits if self.store is not None else 0,
+        }
@@ -1,6 +1,16 @@
-from bin import Bin
+from array import array
+from anytime import Incumbent, expired, make_deadline
+from batch_evaluation import evaluate_batch
+from bin_index import IndexedBins
+from evaluation import Evaluator
+from fitness_cache import FitnessCache, canonical_pattern, item_fingerprint
 from heuristics import BestFit, FirstFit, NextFit, WorstFit
+from instrumentation import NULL_INSTRUMENTATION
+from item import Item
+from parallel_evaluation import PoolEvaluator
+from snapshots import restore_rng_state, rng_state
 import random
+import time
 
 
 class GeneticAlgorithm:
@@ -11,50 +21,240 @@ class GeneticAlgorithm:
     MUTATION_RATE = 0.3
     CROSSOVER_RATE = 0.6
 
-    def __init__(self, capacity, items):
+    def __init__(self, capacity, items=None, cache=None, incremental=False, workers=None, lower_bound=None,
+                 early_abort=False, instrumentation=None, snapshotter=None, rng=None, sizes=None):
         """
         Creates an instance that can run the genetic algorithm.
         :param capacity: The capacity of a bin.
-        :param items: The items that have to be packed in bins.
+        :param items: The items that have to be packed in bins, or None if sizes is given.
+        :param cache: An optional FitnessCache to share between runs.
+        :param incremental: Whether offspring should be evaluated one by one, resuming from the checkpoints of the parent
+        they inherited their prefix from, instead of all at once with evaluate_batch.
+        :param workers: The number of worker processes to evaluate chromosomes with. Evaluation happens in this process if
+        this is not greater than 1.
+        :param lower_bound: An optional lower bound on the number of bins. The search stops as soon as the best solution
+        reaches it.
+        :param early_abort: Whether to stop packing an offspring as soon as it provably cannot beat either of its parents,
+        in which case it would not be selected anyway.
+        :param instrumentation: Optional Instrumentation to record counters, timers and a trace per generation in.
+        :param snapshotter: An optional Snapshotter to write the state of the search to at regular intervals. If it holds
+        a snapshot already, the search resumes from it and continues exactly as the interrupted search would have.
+        :param rng: The random number generator to draw from, e.g. one created with make_rng. Defaults to the global
+        random module.
+        :param sizes: The sizes of the items instead of the items, e.g. the memory-mapped array of a Dataset, so that no
+        Item objects are created unless they are asked for. The sizes are not copied.
         """
-        self.items = items
+        self.capacity = capacity
+        self.rng = rng or random
+        self.sizes = sizes if sizes is not None else array("q", (item.size for item in items))
+        self._items = items
+        self.cache = cache if cache is not None else FitnessCache()
+        self.fingerprint = item_fingerprint(capacity, self.sizes)
+        self.early_abort = early_abort
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+        self.evaluator = Evaluator(capacity, sizes=self.sizes, instrumentation=instrumentation) \
+            if incremental or early_abort else None
+        self.pool = PoolEvaluator(capacity, self.sizes, workers) if workers and workers > 1 else None
+        self.lower_bound = lower_bound
+        self.snapshotter = snapshotter
         self.best_solution = None
-        self.population = [Chromosome(capacity) for _ in range(self.POPULATION_SIZE)]
-        self.update_individuals(self.population)
+        self.population = [Chromosome(capacity, rng=self.rng) for _ in range(self.POPULATION_SIZE)]
 
-    def run(self):
+    def run(self, budget=None, deadline=None):
         """
         Runs the genetic algorithm and returns the results at the end of the process.
+        :param budget: An optional number of seconds that the run may take.
+        :param deadline: An optional time.monotonic() by which the run has to stop.
         :return: (num_iterations, num_no_changes)
         """
-        current_iteration = 0
-        num_no_change = 0
-        while num_no_change < self.MAX_NO_CHANGE and current_iteration < self.MAX_GENERATIONS:
-            new_generation = []
-            while len(new_generation) < self.POPULATION_SIZE:
-                # Select parents
+        for _ in self.iterate(budget, deadline):
+            pass
+        return self.num_iterations, self.num_no_change
+
+    def iterate(self, budget=None, deadline=None, stop=None):
+        """
+        Runs the genetic algorithm, yielding the best chromosome of the initial population and every better chromosome as
+        soon as it is found. The deadline is checked before every generation and between the evaluations of a
+        generation, so the run overshoots it by at most one evaluation, or one batch of evaluations when they are packed
+        simultaneously or on the worker pool.
+        :param budget: An optional number of seconds that the run may take.
+        :param deadline: An optional time.monotonic() by which the run has to stop.
+        :param stop: An optional threading.Event that stops the run when it is set. It is checked with the deadline.
+        :return: A generator of Incumbent tuples.
+        """
+        start_time = time.monotonic()
+        deadline = make_deadline(start_time, budget, deadline)
+        self.num_iterations, self.num_no_change = 0, 0
+        state = self.snapshotter.read("GA", self.fingerprint) if self.snapshotter is not None else None
+        if state is not None:
+            self.restore(state)
+        else:
+            self.evaluate_population(deadline, stop)
+            if self.snapshotter is not None:
+                self.snapshotter.write("GA", self.fingerprint, self.snapshot())
+        try:
+            incumbent = max(self.population, key=lambda x: x.fitness)
+            yield Incumbent(incumbent.pattern, incumbent.fitness, incumbent.num_bins, time.monotonic() - start_time)
+            current_iteration = self.num_iterations
+            num_no_change = self.num_no_change
+            while num_no_change < self.MAX_NO_CHANGE and current_iteration < self.MAX_GENERATIONS \
+                    and not self.reached_lower_bound() and not expired(deadline, stop):
+                if self.evolve(current_iteration, deadline, stop):
+                    num_no_change = 0
+                else:
+                    num_no_change += 1
+                current_iteration += 1
+                self.num_iterations, self.num_no_change = current_iteration, num_no_change
+                if self.snapshotter is not None and self.snapshotter.due():
+                    self.snapshotter.write("GA", self.fingerprint, self.snapshot())
+                if self.best_solution.fitness > incumbent.fitness:
+                    incumbent = self.best_solution
+                    yield Incumbent(incumbent.pattern, incumbent.fitness, incumbent.num_bins,
+                                    time.monotonic() - start_time)
+            if self.snapshotter is not None:
+                self.snapshotter.write("GA", self.fingerprint, self.snapshot())
+        finally:
+            self.close()
+
+    def snapshot(self):
+        """
+        Captures the state of the search between two generations.
+        :return: A dictionary that can be written to JSON.
+        """
+        best = self.best_solution
+        return {
+            "population": [[x.pattern, x.fitness, x.num_bins] for x in self.population],
+            "best": [best.pattern, best.fitness, best.num_bins] if best is not None else None,
+            "iterations": self.num_iterations,
+            "no_change": self.num_no_change,
+            "rng": rng_state(self.rng),
+        }
+
+    def restore(self, state):
+        """
+        Restores the state of the search from a snapshot.
+        :param state: The output of snapshot.
+        """
+        self.population = []
+        for pattern, fitness, num_bins in state["population"]:
+            chromosome = Chromosome(self.capacity, pattern)
+            chromosome.fitness, chromosome.num_bins = fitness, num_bins
+            self.population.append(chromosome)
+        self.best_solution = None
+        if state["best"] is not None:
+            pattern, fitness, num_bins = state["best"]
+            self.best_solution = Chromosome(self.capacity, pattern)
+            self.best_solution.fitness, self.best_solution.num_bins = fitness, num_bins
+        self.num_iterations, self.num_no_change = state["iterations"], state["no_change"]
+        restore_rng_state(state["rng"], self.rng)
+
+    def evaluate_population(self, deadline=None, stop=None):
+        """
+        Evaluates the initial population. Chromosomes that are not evaluated before the deadline keep a fitness of 0.
+        :param deadline: An optional time.monotonic() after which no more chromosomes are evaluated. At least one is.
+        :param stop: An optional threading.Event that has the same effect as the deadline once it is set.
+        :return: The best chromosome.
+        """
+        with self.instrumentation.time("evaluation"):
+            self.best_solution = self.update_individuals(self.population, deadline=deadline, stop=stop)
+        return self.best_solution
+
+    def evolve(self, generation=0, deadline=None, stop=None):
+        """
+        Replaces the population by the next generation.
+        :param generation: The number of the generation, for the trace.
+        :param deadline: An optional time.monotonic() after which no more offspring are evaluated. Offspring that are
+        not evaluated keep a fitness of 0, so their parents survive instead.
+        :param stop: An optional threading.Event that has the same effect as the deadline once it is set.
+        :return: True if the best solution improved, False otherwise.
+        """
+        instrumentation = self.instrumentation
+        families = []
+        while len(families) * 2 < self.POPULATION_SIZE:
+            # Select parents
+            with instrumentation.time("selection"):
                 parent1 = self.select_parent()
                 parent2 = self.select_parent()
-                # Apply genetic operators
+            # Apply genetic operators
+            with instrumentation.time("variation"):
                 child1, child2 = self.crossover(parent1, parent2)
                 child1, child2 = self.mutate(child1), self.mutate(child2)
-                # Update the fitness values of the offspring to determine whether they should be added
-                self.update_individuals([child1, child2])
-                sorted_list = sorted([parent1, parent2, child1, child2], key=lambda x: x.fitness, reverse=True)
-                # Add to new generation the two best chromosomes of the combined parents and offspring
-                new_generation.append(sorted_list[0])
-                new_generation.append(sorted_list[1])
-            self.population = new_generation
-            prev_best = self.best_solution
-            # Evaluate fitness values
-            self.best_solution = self.update_individuals(self.population)
-            # Check if any improvement has happened.
-            if not prev_best or prev_best.fitness == self.best_solution.fitness:
-                num_no_change += 1
-            else:
-                num_no_change = 0
-            current_iteration += 1
-        return current_iteration, num_no_change
+            families.append([parent1, parent2, child1, child2])
+        # Update the fitness values of all the offspring at once to determine whether they should be added
+        offspring = [child for family in families for child in family[2:]]
+        thresholds = None
+        if self.early_abort:
+            thresholds = [min(family[0].fitness, family[1].fitness) for family in families for _ in range(2)]
+        with instrumentation.time("evaluation"):
+            self.update_individuals(offspring, thresholds, deadline, stop)
+        new_generation = []
+        for family in families:
+            sorted_list = sorted(family, key=lambda x: x.fitness, reverse=True)
+            # Add to new generation the two best chromosomes of the combined parents and offspring
+            new_generation.append(sorted_list[0])
+            new_generation.append(sorted_list[1])
+        self.population = new_generation
+        prev_best = self.best_solution
+        # Evaluate fitness values
+        self.best_solution = self.update_individuals(self.population, deadline=deadline, stop=stop)
+        instrumentation.trace(generation=generation, fitness=self.best_solution.fitness,
+                              num_bins=self.best_solution.num_bins, evaluations=self.cache.misses)
+        # Check if any improvement has happened.
+        return prev_best is not None and prev_best.fitness != self.best_solution.fitness
+
+    def emigrants(self, count):
+        """
+        Picks the best chromosomes of the population to send to other populations.
+        :param count: The number of chromosomes.
+        :return: A list of (pattern, fitness, num_bins) tuples, best first.
+        """
+        best = sorted(self.population, key=lambda x: x.fitness, reverse=True)[:count]
+        return [(chromosome.pattern, chromosome.fitness, chromosome.num_bins) for chromosome in best]
+
+    def immigrate(self, migrants):
+        """
+        Replaces the worst chromosomes of the population by chromosomes from other populations. Their fitness values
+        were calculated on the same items, so they are added to the cache instead of being evaluated again.
+        :param migrants: A list of (pattern, fitness, num_bins) tuples.
+        """
+        if not migrants:
+            return
+        self.population.sort(key=lambda x: x.fitness)
+        for i, (pattern, fitness, num_bins) in enumerate(migrants[:len(self.population)]):
+            chromosome = Chromosome(self.capacity, pattern)
+            chromosome.fitness, chromosome.num_bins = fitness, num_bins
+            self.population[i] = chromosome
+            self.cache.put((self.fingerprint, canonical_pattern(pattern, len(self.sizes))), (fitness, num_bins))
+        best = max(self.population, key=lambda x: x.fitness)
+        if self.best_solution is None or best.fitness > self.best_solution.fitness:
+            self.best_solution = best
+
+    @property
+    def items(self):
+        """
+        The items that have to be packed in bins. If only their sizes were given, the Item objects are created the first
+        time they are asked for.
+        :return: A list of items.
+        """
+        if self._items is None:
+            self._items = [Item(size) for size in self.sizes]
+        return self._items
+
+    def reached_lower_bound(self):
+        """
+        Checks whether the best solution uses the provably minimal number of bins.
+        :return: True if the lower bound has been reached, False otherwise.
+        """
+        return self.lower_bound is not None and self.best_solution is not None \
+            and self.best_solution.num_bins <= self.lower_bound
+
+    def close(self):
+        """
+        Shuts down the worker processes, if any.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
 
     def mutate(self, chromosome):
         """
@@ -63,10 +263,10 @@ class GeneticAlgorithm:
         :return: The mutated chromosome.
         """
         pattern = list(chromosome.pattern)
-        if random.random() < self.MUTATION_RATE:
-            mutation_point = random.randrange(len(pattern))
-            pattern[mutation_point] = Chromosome.generate_pattern()
-        return Chromosome(chromosome.bin_capacity, "".join(pattern))
+        if self.rng.random() < self.MUTATION_RATE:
+            mutation_point = self.rng.randrange(len(pattern))
+            pattern[mutation_point] = Chromosome.generate_pattern(self.rng)
+        return Chromosome(chromosome.bin_capacity, "".join(pattern), chromosome.base)
 
     def crossover(self, parent1, parent2):
         """
@@ -76,33 +276,86 @@ class GeneticAlgorithm:
         :return: The two individuals after crossover has been performed.
         """
         pattern1, pattern2 = parent1.pattern, parent2.pattern
-        if random.random() < self.CROSSOVER_RATE:
-            point1, point2 = random.randrange(len(pattern1)), random.randrange(len(pattern2))
+        if self.rng.random() < self.CROSSOVER_RATE:
+            point1, point2 = self.rng.randrange(len(pattern1)), self.rng.randrange(len(pattern2))
             substr1, substr2 = pattern1[point1:], pattern2[point2:]
             pattern1, pattern2 = "".join((pattern1[:point1], substr2)), "".join((pattern2[:point2], substr1))
-        return Chromosome(parent1.bin_capacity, pattern1), Chromosome(parent2.bin_capacity, pattern2)
+        return (Chromosome(parent1.bin_capacity, pattern1, parent1.pattern),
+                Chromosome(parent2.bin_capacity, pattern2, parent2.pattern))
 
-    def update_individuals(self, individuals):
+    def update_individuals(self, individuals, thresholds=None, deadline=None, stop=None):
         """
-        Update the fitness values of all the chromosomes in the population.
+        Update the fitness values of all the chromosomes in the population. Patterns that have been evaluated before are
+        looked up in the cache instead of being packed again.
+        :param individuals: The chromosomes to evaluate.
+        :param thresholds: Optional fitness values, one per chromosome, below which a chromosome will not be selected.
+        Chromosomes whose evaluation is aborted keep a fitness of 0.
+        :param deadline: An optional time.monotonic() after which no more chromosomes are evaluated. Those chromosomes
+        keep a fitness of 0 as well.
+        :param stop: An optional threading.Event that has the same effect as the deadline once it is set.
         """
-        for individual in individuals:
-            solution = individual.generate_solution(self.items)
-            individual.num_bins = len(solution)
-            individual.fitness = sum(b.fitness() for b in solution) / len(solution)
+        keys = [(self.fingerprint, canonical_pattern(individual.pattern, len(self.sizes))) for individual in individuals]
+        results = {key: self.cache.get(key) for key in keys}
+        missing = {}
+        for individual, key, threshold in zip(individuals, keys, thresholds or [None] * len(individuals)):
+            if results[key] is None:
+                if key in missing:
+                    # Equivalent chromosomes are evaluated once, so only abort if none of them can be selected.
+                    other = missing[key][1]
+                    threshold = None if threshold is None or other is None else min(threshold, other)
+                missing[key] = (individual, threshold)
+        patterns = [individual.pattern for individual, _ in missing.values()]
+        bases = [individual.base for individual, _ in missing.values()]
+        self.instrumentation.count("evaluations", len(missing))
+        self.instrumentation.count("duplicate_patterns", len(individuals) - len(missing))
+        thresholds = [t for _, t in missing.values()]
+        for key, result in zip(missing, self.evaluate(patterns, bases, thresholds, deadline, stop)):
+            results[key] = result
+            if result is not None:
+                self.cache.put(key, result)
+        for individual, key in zip(individuals, keys):
+            if results[key] is not None:
+                individual.fitness, individual.num_bins = results[key]
         return max(self.population, key=lambda x: x.fitness)
 
+    def evaluate(self, patterns, bases, thresholds, deadline=None, stop=None):
+        """
+        Evaluates patterns on the worker pool, with the checkpointed evaluator, or all at once with evaluate_batch.
+        :param patterns: The patterns to evaluate.
+        :param bases: The patterns that the patterns were derived from, or None.
+        :param thresholds: The fitness values to beat, or None.
+        :param deadline: An optional time.monotonic() after which no more patterns are evaluated. The first pattern, or
+        the first pattern per worker process, always is.
+        :param stop: An optional threading.Event that has the same effect as the deadline once it is set.
+        :return: A list of (fitness, num_bins) tuples, or None for aborted and unevaluated patterns, one per pattern.
+        """
+        if self.pool is None and self.evaluator is None:
+            return evaluate_batch(self.capacity, None, patterns, sizes=self.sizes, instrumentation=self.instrumentation,
+                                  deadline=deadline, stop=stop)
+        if self.pool is None:
+            step = 1
+        else:
+            # Without a deadline, the whole batch is handed to the pool at once to keep every worker busy.
+            step = self.pool.workers if deadline is not None or stop is not None else max(len(patterns), 1)
+        results = []
+        for start in range(0, len(patterns), step):
+            if results and expired(deadline, stop):
+                results.extend([None] * (len(patterns) - start))
+                break
+            tasks = patterns[start:start + step], bases[start:start + step], thresholds[start:start + step]
+            if self.pool is not None:
+                results.extend(self.pool.evaluate(*tasks))
+            else:
+                results.extend(self.evaluator.evaluate(*task) for task in zip(*tasks))
+        return results
+
     def select_parent(self):
         """
-        Selects a parent from the current population by applying tournament selection.
+        Selects a parent from the current population by applying tournament selection. All the contestants are drawn at
+        once, and the first of the fittest wins.
         :return: The selected parent.
         """
-        candidate = random.choice(self.population)
-        for _ in range(self.TOURNAMENT_SIZE - 1):
-            opponent = random.choice(self.population)
-            if opponent.fitness > candidate.fitness:
-                candidate = opponent
-        return candidate
+        return max(self.rng.choices(self.population, k=self.TOURNAMENT_SIZE), key=lambda x: x.fitness)
 
 
 class Chromosome:
@@ -114,20 +367,29 @@ class Chromosome:
         "b": BestFit,
     }
 
-    def __init__(self, capacity, pattern=None):
+    def __init__(self, capacity, pattern=None, base=None, rng=None):
+        """
+        Creates a chromosome.
+        :param capacity: The capacity of a bin.
+        :param pattern: The pattern of heuristics. A random pattern is generated if none is given.
+        :param base: The pattern of the parent that this chromosome inherited the start of its pattern from, if any.
+        :param rng: The random number generator to generate a pattern with. Defaults to the global random module.
+        """
         self.bin_capacity = capacity
         self.fitness = 0
         self.num_bins = 0
-        self.pattern = pattern or self.generate_pattern()
+        self.pattern = pattern or self.generate_pattern(rng or random)
+        self.base = base
 
     @staticmethod
-    def generate_pattern():
+    def generate_pattern(rng=random):
         """
         Generates a random pattern.
+        :param rng: The random number generator to draw from.
         :return: The generated pattern string.
         """
-        return "".join(
-            [random.choice(list(Chromosome.heuristic_map.keys())) for _ in range(random.randrange(Chromosome.MAX_COMBINATION_LENGTH) or 1)])
+        length = rng.randrange(Chromosome.MAX_COMBINATION_LENGTH) or 1
+        return "".join(rng.choices(list(Chromosome.heuristic_map), k=length))
 
     def generate_solution(self, items):
         """
@@ -135,7 +397,7 @@ class Chromosome:
         :param items: The items that need to be used when generating a solution.
         :return: A list of bins to serve as a solution.
         """
-        solution = [Bin(self.bin_capacity)]
+        solution = IndexedBins(self.bin_capacity)
         pattern_length = len(self.pattern)
         for idx, item in enumerate(items):
             h = self.pattern[idx % pattern_length]
@@ -1,4 +1,5 @@
 from bin import Bin
+from bin_index import IndexedBins
 
 
 class Heuristic:
@@ -22,6 +23,8 @@ class FirstFit(Heuristic):
         :param bins: The bins to choose from.
         :return: The list of bins after the insertion.
         """
+        if isinstance(bins, IndexedBins):
+            return bins.place(bins.index.first_fit(item.size), item)
         b = next((b for b in bins if b.can_add_item(item)), None)
         if not b:
             b = Bin(bins[0].capacity)
@@ -39,6 +42,8 @@ class BestFit(Heuristic):
         :param bins: The bins to choose from.
         :return: The list of bins after the insertion.
         """
+        if isinstance(bins, IndexedBins):
+            return bins.place(bins.index.best_fit(item.size), item)
         valid_bins = (b for b in bins if b.can_add_item(item))
         # Note that this method is exactly the same as for the BestFit heuristic except for the following line.
         sorted_bins = sorted(valid_bins, key=lambda x: x.filled_space(), reverse=True)
@@ -60,6 +65,8 @@ class NextFit(Heuristic):
         :param bins: The bins to choose from.
         :return: The list of bins after insertion.
         """
+        if isinstance(bins, IndexedBins):
+            return bins.place(bins.index.next_fit(item.size), item)
         b = bins[-1]
         if not b.add_item(item):
             b = Bin(bins[0].capacity)
@@ -77,6 +84,8 @@ class WorstFit(Heuristic):
         :param bins: The bins to choose from.
         :return: The list of bins after insertion.
         """
+        if isinstance(bins, IndexedBins):
+            return bins.place(bins.index.worst_fit(item.size), item)
         valid_bins = (b for b in bins if b.can_add_item(item))
         sorted_bins = sorted(valid_bins, key=lambda x: x.filled_space())
         if sorted_bins:
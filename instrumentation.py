@@ -0,0 +1,192 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+import sys
+import threading
+import time
+
+
+class NullInstrumentation:
+    """
+    Instrumentation that records nothing. This is the default, so that the search engines only pay for a few no-op calls
+    per iteration when instrumentation is disabled.
+    """
+    enabled = False
+
+    def count(self, name, amount=1):
+        pass
+
+    def add_time(self, name, seconds):
+        pass
+
+    def time(self, name):
+        return nullcontext()
+
+    def trace(self, **row):
+        pass
+
+    def wrap_heuristics(self, heuristic_map):
+        return heuristic_map
+
+    def wrap_selectors(self, selectors):
+        return selectors
+
+    def export(self):
+        return None
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+class _TimedHeuristic:
+    def __init__(self, heuristic, instrumentation):
+        self.heuristic = heuristic
+        self.instrumentation = instrumentation
+        self.name = "heuristic." + heuristic.__name__
+
+    def apply(self, item, bins):
+        start_time = time.perf_counter()
+        bins = self.heuristic.apply(item, bins)
+        self.instrumentation.add_time(self.name, time.perf_counter() - start_time)
+        return bins
+
+
+class Instrumentation(NullInstrumentation):
+    enabled = True
+
+    def __init__(self):
+        """
+        Creates instrumentation that records counters, timers and a trace of rows, e.g. one per generation.
+        """
+        self.counters = Counter()
+        self.timers = defaultdict(float)
+        self.rows = []
+        self.start_time = time.perf_counter()
+
+    def count(self, name, amount=1):
+        """
+        Increments a counter.
+        """
+        self.counters[name] += amount
+
+    def add_time(self, name, seconds):
+        """
+        Adds to a timer, and counts the number of times it was added to.
+        """
+        self.timers[name] += seconds
+        self.counters[name] += 1
+
+    @contextmanager
+    def time(self, name):
+        """
+        Times the body of a with statement.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    def trace(self, **row):
+        """
+        Appends a row to the trace, together with the time since the instrumentation was created.
+        """
+        row["elapsed"] = time.perf_counter() - self.start_time
+        self.rows.append(row)
+
+    def wrap_heuristics(self, heuristic_map):
+        """
+        Wraps the heuristics of a heuristic map so that the time spent in each of them is recorded.
+        :param heuristic_map: A dictionary mapping characters to Heuristic classes.
+        :return: A dictionary mapping the same characters to timed heuristics.
+        """
+        return {h: _TimedHeuristic(heuristic, self) for h, heuristic in heuristic_map.items()}
+
+    def wrap_selectors(self, selectors):
+        """
+        Wraps the BinIndex selectors used by the Evaluator so that the time spent in each of them is recorded.
+        :param selectors: A dictionary mapping characters to BinIndex methods.
+        :return: A dictionary mapping the same characters to timed functions.
+        """
+        def timed(name, selector):
+            def select(index, size):
+                start_time = time.perf_counter()
+                position = selector(index, size)
+                self.add_time(name, time.perf_counter() - start_time)
+                return position
+            return select
+        return {h: timed("selector." + selector.__name__, selector) for h, selector in selectors.items()}
+
+    def export(self):
+        """
+        Exports everything that has been recorded.
+        :return: A dictionary with the counters, the timers in seconds and the trace.
+        """
+        return {
+            "counters": dict(self.counters),
+            "timers": dict(self.timers),
+            "trace": self.rows,
+        }
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, thread=None):
+        """
+        Creates a profiler that periodically samples the stack of a thread from a background thread.
+        :param interval: The number of seconds between samples.
+        :param thread: The thread to sample. Defaults to the thread that creates the profiler.
+        """
+        self.interval = interval
+        self.thread_id = (thread or threading.current_thread()).ident
+        self.own = Counter()
+        self.cumulative = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.own[self._name(frame)] += 1
+            seen = set()
+            while frame is not None:
+                name = self._name(frame)
+                if name not in seen:
+                    seen.add(name)
+                    self.cumulative[name] += 1
+                frame = frame.f_back
+
+    @staticmethod
+    def _name(frame):
+        code = frame.f_code
+        return "{}:{}:{}".format(code.co_filename.rsplit("/", 1)[-1], code.co_firstlineno, code.co_name)
+
+    def start(self):
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def export(self, limit=20):
+        """
+        Exports the functions in which the most samples were taken.
+        :param limit: The number of functions to export.
+        :return: A dictionary with the number of samples and the top functions by own and cumulative samples.
+        """
+        return {
+            "samples": self.samples,
+            "interval": self.interval,
+            "own": self.own.most_common(limit),
+            "cumulative": self.cumulative.most_common(limit),
+        }
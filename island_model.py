@@ -0,0 +1,159 @@
+from array import array
+from genetic_algorithm import Chromosome, GeneticAlgorithm
+from multiprocessing import Pipe, Process
+from rng import draw_seed, spawn
+
+
+def ring(island, num_islands):
+    """
+    Each island receives migrants from the previous island.
+    """
+    return [(island - 1) % num_islands] if num_islands > 1 else []
+
+
+def complete(island, num_islands):
+    """
+    Each island receives migrants from every other island.
+    """
+    return [other for other in range(num_islands) if other != island]
+
+
+def star(island, num_islands):
+    """
+    The first island receives migrants from every other island, which only receive migrants from the first island.
+    """
+    return complete(island, num_islands) if island == 0 else [0]
+
+
+topologies = {
+    "ring": ring,
+    "complete": complete,
+    "star": star,
+}
+
+
+def _island(connection, capacity, sizes, seed, island, options):
+    """
+    Evolves the population of one island in a worker process. Each message from the coordinator holds the immigrants
+    for the island and the number of generations to run next; the island answers with its emigrants.
+    """
+    ga = GeneticAlgorithm(capacity, sizes=sizes, rng=spawn(seed, island), **options)
+    ga.evaluate_population()
+    generation = 0
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        immigrants, generations, num_emigrants = message
+        ga.immigrate(immigrants)
+        for _ in range(generations):
+            if ga.reached_lower_bound():
+                break
+            ga.evolve(generation)
+            generation += 1
+        connection.send(ga.emigrants(num_emigrants))
+    ga.close()
+    connection.close()
+
+
+class IslandModel:
+    NUM_ISLANDS = 4
+    MIGRATION_INTERVAL = 10
+    NUM_MIGRANTS = 2
+    MAX_GENERATIONS = GeneticAlgorithm.MAX_GENERATIONS
+    MAX_NO_CHANGE = GeneticAlgorithm.MAX_NO_CHANGE
+
+    def __init__(self, capacity, items=None, islands=None, topology="ring", interval=None, migrants=None, seed=None,
+                 lower_bound=None, early_abort=False, sizes=None):
+        """
+        Creates an instance that runs the genetic algorithm on several populations at once, each in its own process.
+        Every few generations the best chromosomes of each island migrate to its neighbours in the topology. Only
+        patterns and fitness values are sent between processes.
+        :param capacity: The capacity of a bin.
+        :param items: The items that have to be packed in bins, or None if sizes is given.
+        :param islands: The number of islands.
+        :param topology: The name of the topology in topologies along which chromosomes migrate.
+        :param interval: The number of generations between migrations.
+        :param migrants: The number of chromosomes that each island sends to its neighbours.
+        :param seed: The seed that the random number generators of the islands are derived from. Drawn from the global
+        random module if not given.
+        :param lower_bound: An optional lower bound on the number of bins. The search stops as soon as it is reached.
+        :param early_abort: Whether the islands abort the evaluation of offspring that cannot be selected.
+        :param sizes: The sizes of the items instead of the items. Only the sizes are sent to the islands, and they are
+        not copied.
+        """
+        if topology not in topologies:
+            raise ValueError("Unknown topology: {}".format(topology))
+        self.capacity = capacity
+        self.sizes = sizes if sizes is not None else array("q", (item.size for item in items))
+        self.num_islands = islands or self.NUM_ISLANDS
+        self.topology = topology
+        self.interval = interval or self.MIGRATION_INTERVAL
+        self.num_migrants = migrants or self.NUM_MIGRANTS
+        self.seed = seed if seed is not None else draw_seed()
+        self.lower_bound = lower_bound
+        self.early_abort = early_abort
+        self.best_solution = None
+
+    def run(self):
+        """
+        Runs the islands until the best solution over all islands stops improving, the maximum number of generations
+        has been run or the lower bound has been reached.
+        :return: (num_iterations, num_no_changes), counted in generations.
+        """
+        options = {"lower_bound": self.lower_bound, "early_abort": self.early_abort}
+        connections, processes = [], []
+        for island in range(self.num_islands):
+            connection, child_connection = Pipe()
+            process = Process(target=_island, args=(child_connection, self.capacity, self.sizes, self.seed, island,
+                                                    options))
+            process.start()
+            child_connection.close()
+            connections.append(connection)
+            processes.append(process)
+        sources = [topologies[self.topology](island, self.num_islands) for island in range(self.num_islands)]
+        emigrants = [[] for _ in range(self.num_islands)]
+        current_iteration = 0
+        num_no_change = 0
+        try:
+            while num_no_change < self.MAX_NO_CHANGE and current_iteration < self.MAX_GENERATIONS \
+                    and not self.reached_lower_bound():
+                generations = min(self.interval, self.MAX_GENERATIONS - current_iteration)
+                for island, connection in enumerate(connections):
+                    immigrants = sorted((migrant for source in sources[island] for migrant in emigrants[source]),
+                                        key=lambda migrant: migrant[1], reverse=True)
+                    connection.send((immigrants[:self.num_migrants], generations, self.num_migrants))
+                emigrants = [connection.recv() for connection in connections]
+                current_iteration += generations
+                if self.update_best(emigrants):
+                    num_no_change = 0
+                else:
+                    num_no_change += generations
+        finally:
+            for connection in connections:
+                connection.send(None)
+                connection.close()
+            for process in processes:
+                process.join()
+        return current_iteration, num_no_change
+
+    def update_best(self, emigrants):
+        """
+        Updates the best solution over all islands from the best chromosomes that they sent.
+        :param emigrants: The emigrants of each island, best first.
+        :return: True if the best solution improved, False otherwise.
+        """
+        pattern, fitness, num_bins = max((best[0] for best in emigrants if best), key=lambda migrant: migrant[1])
+        if self.best_solution is not None and fitness <= self.best_solution.fitness:
+            return False
+        self.best_solution = Chromosome(self.capacity, pattern)
+        self.best_solution.fitness, self.best_solution.num_bins = fitness, num_bins
+        return True
+
+    def reached_lower_bound(self):
+        """
+        Checks whether the best solution uses the provably minimal number of bins.
+        :return: True if the lower bound has been reached, False otherwise.
+        """
+        return self.lower_bound is not None and self.best_solution is not None \
+            and self.best_solution.num_bins <= self.lower_bound
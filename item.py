@@ -1,3 +1,5 @@
 class Item:
+    __slots__ = ("size",)
+
     def __init__(self, size):
         self.size = size
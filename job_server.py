@@ -0,0 +1,370 @@
+from array import array
+from bounds import lower_bound_l2
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataset_registry import parse_bpp
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rng import draw_seed, make_rng
+from runner import algorithms
+from urllib.parse import parse_qs, urlparse
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+
+
+def log(message, end=None):
+    print(message, flush=True, end=end)
+
+
+# The sizes of the items of the instances that a worker process has solved before, keyed by their content hash.
+_instances = OrderedDict()
+MAX_WORKER_INSTANCES = 32
+
+
+class InstanceMissing(Exception):
+    """
+    Raised by a worker process that was sent a job without the sizes of its instance and does not hold them yet.
+    """
+
+
+def _solve(task):
+    """
+    Solves a single job in a worker process.
+    :param task: (algorithm, instance_hash, capacity, sizes, options). The sizes are None unless the worker has
+    reported that it does not hold them.
+    :return: A dictionary mapping result names to summaries.
+    """
+    algorithm, instance_hash, capacity, sizes, options = task
+    cached = _instances.get(instance_hash)
+    if cached is None:
+        if sizes is None:
+            raise InstanceMissing(instance_hash)
+        cached = _instances[instance_hash] = array("q", sizes)
+        if len(_instances) > MAX_WORKER_INSTANCES:
+            _instances.popitem(last=False)
+    else:
+        _instances.move_to_end(instance_hash)
+    options = dict(options)
+    rng = options["rng"] = make_rng(options["seed"])
+    sizes = array("q", cached)
+    if options.get("shuffle"):
+        rng.shuffle(sizes)
+    results = algorithms[algorithm](capacity, sizes, options)
+    for summary in results.values():
+        summary["seed"] = options["seed"]
+        if options.get("lower_bound") is not None:
+            summary["lower_bound"] = options["lower_bound"]
+            summary["gap"] = summary["num_bins"] - options["lower_bound"]
+    return results
+
+
+class JobQueue:
+    MAX_FINISHED = 10000
+    MAX_INSTANCES = 256
+    # The number of seconds over which the recent throughput is measured.
+    THROUGHPUT_WINDOW = 60.0
+    # The algorithm options that clients may set. The others, e.g. worker processes, snapshot paths or an evaluation
+    # store, are for campaigns run by the operator of the machine.
+    OPTIONS = {"tabu_list", "tabu_tenure", "neighbourhood_size", "early_abort", "shuffle", "stop_at_lower_bound"}
+    # The algorithms that return their best solution so far once their time budget is spent.
+    TIME_LIMITED_ALGORITHMS = {"TabuSearch", "GA"}
+
+    def __init__(self, workers=None):
+        """
+        Creates a priority queue of packing jobs that are run on a pool of worker processes. The workers stay alive
+        between jobs and keep the sizes of the items of recent instances, so a job only sends the hash of its instance
+        and only pays for its search. The sizes are sent along when the worker that picks the job up does not hold
+        them yet.
+        :param workers: The number of worker processes. Defaults to the number of CPUs.
+        """
+        self.workers = workers or os.cpu_count()
+        self.executor = ProcessPoolExecutor(self.workers)
+        self.condition = threading.Condition()
+        self.queue = []
+        self.jobs = OrderedDict()
+        self.instances = OrderedDict()
+        self.instances_lock = threading.Lock()
+        self.counter = itertools.count()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.finish_times = deque()
+        self.start_time = time.monotonic()
+        self.closed = False
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def parse_instance(self, contents=None, capacity=None, sizes=None):
+        """
+        Parses an instance given in the .BPP format or as a capacity and a list of sizes. Instances that have been
+        submitted before are not parsed again.
+        :param contents: The contents of a .BPP file, as bytes or str.
+        :param capacity: The capacity of a bin, if contents is not given.
+        :param sizes: The sizes of the items, if contents is not given.
+        :return: (instance_hash, capacity, sizes, lower_bound), where the content hash identifies the instance.
+        """
+        if contents is not None:
+            if isinstance(contents, str):
+                contents = contents.encode()
+            instance_hash = hashlib.blake2b(contents, digest_size=16).hexdigest()
+        else:
+            if capacity is None or not sizes:
+                raise ValueError("An instance needs a capacity and at least one item")
+            capacity, sizes = int(capacity), [int(size) for size in sizes]
+            instance_hash = hashlib.blake2b(json.dumps([capacity, sizes]).encode(), digest_size=16).hexdigest()
+        with self.instances_lock:
+            instance = self.instances.get(instance_hash)
+            if instance is not None:
+                self.instances.move_to_end(instance_hash)
+                return (instance_hash,) + instance
+        if contents is not None:
+            capacity, sizes = parse_bpp(contents)
+            sizes = list(sizes)
+        if capacity <= 0:
+            raise ValueError("The capacity of a bin has to be positive")
+        if not sizes or any(not 0 < size <= capacity for size in sizes):
+            raise ValueError("Every item has to be larger than 0 and at most the capacity of a bin")
+        instance = (capacity, sizes, lower_bound_l2(capacity, sizes))
+        with self.instances_lock:
+            self.instances[instance_hash] = instance
+            self.instances.move_to_end(instance_hash)
+            if len(self.instances) > self.MAX_INSTANCES:
+                self.instances.popitem(last=False)
+        return (instance_hash,) + instance
+
+    def submit(self, instance, algorithm="TabuSearch", priority=0, time_limit=None, seed=None, options=None):
+        """
+        Queues a job. Jobs with a higher priority run first, and jobs with the same priority in the order in which they
+        were submitted.
+        :param instance: The instance returned by parse_instance.
+        :param algorithm: The name of the algorithm, as a key of runner.algorithms.
+        :param priority: The priority of the job.
+        :param time_limit: The number of seconds after which the search returns its best solution so far. Only
+        accepted for the TIME_LIMITED_ALGORITHMS.
+        :param seed: The seed of the job. Drawn at random if not given, and recorded in the results.
+        :param options: Further algorithm options, as accepted by the runner. Only the OPTIONS may be set.
+        :return: The id of the job.
+        """
+        if algorithm not in algorithms:
+            raise ValueError("Unknown algorithm: {}".format(algorithm))
+        if time_limit is not None:
+            if algorithm not in self.TIME_LIMITED_ALGORITHMS:
+                raise ValueError("{} does not support a time limit".format(algorithm))
+            if not time_limit > 0:
+                raise ValueError("The time limit has to be positive")
+        options = dict(options or {})
+        unknown = sorted(set(options) - self.OPTIONS)
+        if unknown:
+            raise ValueError("Unknown options: {}".format(", ".join(unknown)))
+        instance_hash, capacity, sizes, lower_bound = instance
+        options["seed"] = seed if seed is not None else draw_seed()
+        options["time_budget"] = time_limit
+        if options.pop("stop_at_lower_bound", True):
+            options["lower_bound"] = lower_bound
+        with self.condition:
+            if self.closed:
+                raise ValueError("The server is shutting down")
+            sequence = next(self.counter)
+            job_id = "{:x}-{}".format(int(time.time()), sequence)
+            self.jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "algorithm": algorithm,
+                "priority": priority,
+                "num_items": len(sizes),
+                "submitted": time.time(),
+            }
+            heapq.heappush(self.queue, (-priority, sequence, job_id, (algorithm, instance_hash, capacity, None,
+                                                                      options), sizes))
+            self.condition.notify_all()
+        return job_id
+
+    def get(self, job_id):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _dispatch(self):
+        """
+        Hands the queued jobs to the worker pool, at most one per worker at a time, so that a job with a higher priority
+        that arrives later overtakes the jobs that are still queued.
+        """
+        while True:
+            with self.condition:
+                while not self.closed and (not self.queue or self.running >= self.workers):
+                    self.condition.wait()
+                if self.closed:
+                    return
+                _, _, job_id, task, sizes = heapq.heappop(self.queue)
+                self.running += 1
+                job = self.jobs[job_id]
+                job["status"] = "running"
+                job["started"] = time.time()
+            self._start(job_id, task, sizes)
+
+    def _start(self, job_id, task, sizes):
+        future = self.executor.submit(_solve, task)
+        future.add_done_callback(lambda future: self._finish(job_id, task, sizes, future))
+
+    def _finish(self, job_id, task, sizes, future):
+        results, error = None, None
+        try:
+            results = future.result()
+        except InstanceMissing:
+            # The worker that picked the job up has not solved the instance before, so the job is sent again with the
+            # sizes. The job keeps its place among the running jobs.
+            algorithm, instance_hash, capacity, _, options = task
+            try:
+                return self._start(job_id, (algorithm, instance_hash, capacity, sizes, options), sizes)
+            except RuntimeError as e:
+                error = e
+        except Exception as e:
+            error = e
+        with self.condition:
+            self.running -= 1
+            job = self.jobs[job_id]
+            job["finished"] = time.time()
+            if error is None:
+                job["results"] = results
+                job["status"] = "done"
+                self.completed += 1
+            else:
+                job["status"] = "failed"
+                job["error"] = repr(error)
+                self.failed += 1
+            self.finish_times.append(time.monotonic())
+            self._forget_finished()
+            self.condition.notify_all()
+
+    def _forget_finished(self):
+        finished = len(self.jobs) - len(self.queue) - self.running
+        for job_id in list(self.jobs):
+            if finished <= self.MAX_FINISHED:
+                break
+            if self.jobs[job_id]["status"] in ("done", "failed"):
+                del self.jobs[job_id]
+                finished -= 1
+
+    def stats(self):
+        """
+        Summarises the load of the server.
+        :return: A dictionary with the queue depth, the number of running and finished jobs and the throughput.
+        """
+        with self.condition:
+            now = time.monotonic()
+            while self.finish_times and self.finish_times[0] < now - self.THROUGHPUT_WINDOW:
+                self.finish_times.popleft()
+            uptime = now - self.start_time
+            return {
+                "workers": self.workers,
+                "queue_depth": len(self.queue),
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "uptime": uptime,
+                "jobs_per_minute": len(self.finish_times) * 60 / min(uptime, self.THROUGHPUT_WINDOW) if uptime else 0.0,
+                "cached_instances": len(self.instances),
+            }
+
+    def close(self):
+        """
+        Stops dispatching jobs and shuts the worker pool down once the running jobs have finished.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.executor.shutdown()
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the job queue over HTTP:
+
+    POST /jobs submits an instance, either as a JSON document {"capacity": ..., "sizes": [...]} or {"bpp": "..."}
+    with optional "algorithm", "priority", "time_limit", "seed" and "options" fields, or as the raw contents of a .BPP
+    file with those fields as query parameters. Options that clients may not set, and time limits for algorithms that
+    cannot honour them, are rejected. GET /jobs/<id> returns the status and results of a job, and GET /stats
+    the load of the server.
+    """
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/jobs":
+            return self._reply(404, {"error": "Not found"})
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        queue = self.server.queue
+        try:
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                request = json.loads(body)
+                instance = queue.parse_instance(request.get("bpp"), request.get("capacity"), request.get("sizes"))
+            else:
+                request = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                instance = queue.parse_instance(body)
+            time_limit = request.get("time_limit")
+            seed = request.get("seed")
+            job_id = queue.submit(instance, request.get("algorithm", "TabuSearch"),
+                                  int(request.get("priority", 0)), float(time_limit) if time_limit is not None else None,
+                                  int(seed) if seed is not None else None, request.get("options"))
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            return self._reply(400, {"error": str(e)})
+        self._reply(202, {"id": job_id})
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/stats":
+            return self._reply(200, self.server.queue.stats())
+        if path.startswith("/jobs/"):
+            job = self.server.queue.get(path[len("/jobs/"):])
+            if job is not None:
+                return self._reply(200, job)
+        self._reply(404, {"error": "Not found"})
+
+    def _reply(self, status, document):
+        body = json.dumps(document).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class JobServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=8080, workers=None):
+        """
+        Creates an HTTP server for a JobQueue.
+        :param host: The address to listen on. Defaults to the local machine only.
+        :param port: The port to listen on.
+        :param workers: The number of worker processes.
+        """
+        self.queue = JobQueue(workers)
+        super().__init__((host, port), JobRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.queue.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serves a queue of bin-packing jobs over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+    server = JobServer(args.host, args.port, args.workers)
+    log("Serving jobs on http://{}:{} with {} workers".format(args.host, args.port, server.queue.workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -3,11 +3,12 @@ import random
 
 class MoveOperator:
     @staticmethod
-    def apply(items, choices):
+    def apply(items, choices, rng=random):
         """
         Applies the operator to the given items.
         :param items: The items to which the operator should be applied.
         :param choices: Items that the operator can inject into the items if necessary.
+        :param rng: The random number generator to draw from.
         :return: The list of items after the operator was applied.
         """
         return items
@@ -15,66 +16,75 @@ class MoveOperator:
 
 class Remove(MoveOperator):
     @staticmethod
-    def apply(items, choices):
+    def apply(items, choices, rng=random):
         """
         Removes one or more of the items from the items list. Guarantees that there will always be at least one item
         left in the list of items.
         :param items: The items to which the operator should be applied.
         :param choices: Items that the operator can inject into the items if necessary.
+        :param rng: The random number generator to draw from.
         :return: The list of items after the operator was applied.
         """
-        num_removals = random.randrange(len(items))
+        num_removals = rng.randrange(len(items))
+        if not num_removals:
+            return items
+        items = list(items)
         for _ in range(num_removals):
-            to_remove = random.randrange(len(items))
-            items = items[:to_remove] + items[to_remove + 1:]
-        return items
+            del items[rng.randrange(len(items))]
+        return "".join(items)
 
 
 class Add(MoveOperator):
     @staticmethod
-    def apply(items, choices):
+    def apply(items, choices, rng=random):
         """
         Adds one or more randomly picked items from the choices list to the list of items.
         :param items: The items to which the operator should be applied.
         :param choices: Items that the operator can inject into the items if necessary.
+        :param rng: The random number generator to draw from.
         :return: The list of items after the operator was applied.
         """
-        num_inserts = random.randrange(len(items) + 1)
+        num_inserts = rng.randrange(len(items) + 1)
+        if not num_inserts:
+            return items
+        items = list(items)
         for _ in range(num_inserts):
-            to_insert = random.randrange(len(items))
-            items = items[:to_insert] + random.choice(choices) + items[to_insert:]
-        return items
+            to_insert = rng.randrange(len(items))
+            items.insert(to_insert, rng.choice(choices))
+        return "".join(items)
 
 
 class Change(MoveOperator):
     @staticmethod
-    def apply(items, choices):
+    def apply(items, choices, rng=random):
         """
         Changes one or more of the items in the item list to a randomly picked item in the choices list.
         :param items: The items to which the operator should be applied.
         :param choices: Items that the operator can inject into the items if necessary.
+        :param rng: The random number generator to draw from.
         :return: The list of items after the operator was applied.
         """
-        num_changes = random.randrange(len(items)+1)
+        num_changes = rng.randrange(len(items)+1)
         items = list(items)
         for _ in range(num_changes):
-            to_change = random.randrange(len(items))
-            items[to_change] = random.choice(choices)
+            to_change = rng.randrange(len(items))
+            items[to_change] = rng.choice(choices)
         return "".join(items)
 
 
 class Swap(MoveOperator):
     @staticmethod
-    def apply(items, choices):
+    def apply(items, choices, rng=random):
         """
         Swaps one or more of the items with another one in the item list.
         :param items: The items to which the operator should be applied.
         :param choices: Items that the operator can inject into the items if necessary.
+        :param rng: The random number generator to draw from.
         :return: The list of items after the operator was applied.
         """
-        num_swaps = random.randrange(len(items))
+        num_swaps = rng.randrange(len(items))
         items = list(items)
         for _ in range(num_swaps):
-            idx1, idx2 = random.randrange(len(items)), random.randrange(len(items))
+            idx1, idx2 = rng.randrange(len(items)), rng.randrange(len(items))
             items[idx1], items[idx2] = items[idx2], items[idx1]
         return "".join(items)
@@ -0,0 +1,230 @@
+from bin_index import BinIndex
+from collections import deque
+from evaluation import selectors
+import argparse
+import asyncio
+import json
+import time
+
+
+def log(message, end=None):
+    print(message, flush=True, end=end)
+
+
+class OnlinePacker:
+    MAX_LATENCIES = 100000
+    # Closed bins are dropped from the index once there are at least this many, and more than there are open bins.
+    MIN_COMPACTION = 64
+
+    def __init__(self, capacity, pattern, max_open_bins=None, min_item_size=1):
+        """
+        Creates a packer that places items one at a time as they arrive, applying the heuristics of a pattern (e.g. one
+        found by TabuSearch or GeneticAlgorithm) in turn. Fed the items of a data set in order, it packs them exactly
+        like generate_solution does with the same pattern, as long as no bins are closed early.
+        :param capacity: The capacity of a bin.
+        :param pattern: A pattern indicating the order in which heuristics need to be applied.
+        :param max_open_bins: The maximum number of bins that are open at the same time. When another bin is needed, the
+        fullest open bin is closed first. Unlimited if not given.
+        :param min_item_size: The size of the smallest item that can arrive. Bins with less residual capacity are closed
+        as soon as they are filled that far.
+        """
+        if not pattern or any(h not in selectors for h in pattern):
+            raise ValueError("Invalid pattern: {!r}".format(pattern))
+        self.capacity = capacity
+        self.pattern = pattern
+        self.max_open_bins = max_open_bins
+        self.min_item_size = min_item_size
+        self.index = BinIndex(capacity)
+        # The id of the bin at every position of the index. Positions change when closed bins are dropped, ids do not.
+        self.bin_ids = []
+        # The ids of the items in each open bin, keyed by its position.
+        self.contents = {}
+        self.num_items = 0
+        self.num_opened = 0
+        self.num_closed = 0
+        self.latencies = deque(maxlen=self.MAX_LATENCIES)
+
+    def place(self, size):
+        """
+        Places an item in a bin.
+        :param size: The size of the item, an integer.
+        :return: (item, bin, events) where item is the id of the item, bin is the id of the bin it was placed in and
+        events is a list of the bins that were opened and closed because of it.
+        """
+        start_time = time.perf_counter()
+        if not isinstance(size, int) or isinstance(size, bool):
+            raise TypeError("Item size {!r} is not an integer".format(size))
+        if not 0 < size <= self.capacity:
+            raise ValueError("Item of size {} does not fit in a bin of capacity {}".format(size, self.capacity))
+        index = self.index
+        events = []
+        position = None
+        if self.contents:
+            position = selectors[self.pattern[self.num_items % len(self.pattern)]](index, size)
+        if position is None:
+            if self.max_open_bins and len(self.contents) >= self.max_open_bins:
+                # Closed bins are left out of the ordering, so this finds the fullest open bin.
+                events.append(self._close(index.best_fit(0)))
+            position = index.open()
+            self.bin_ids.append(self.num_opened)
+            self.num_opened += 1
+            self.contents[position] = []
+            events.append({"event": "open", "bin": self.bin_ids[position]})
+        item = self.num_items
+        self.num_items += 1
+        self.contents[position].append(item)
+        index.consume(position, size)
+        bin_id = self.bin_ids[position]
+        if index.residuals[position] < self.min_item_size:
+            events.append(self._close(position))
+        closed = len(index) - len(self.contents)
+        if closed >= self.MIN_COMPACTION and closed > len(self.contents):
+            self._compact()
+        self.latencies.append(time.perf_counter() - start_time)
+        return item, bin_id, events
+
+    def flush(self):
+        """
+        Closes every open bin, e.g. at the end of a shift.
+        :return: The close events of the bins.
+        """
+        return [self._close(position) for position in list(self.contents)]
+
+    def _close(self, position):
+        load = self.capacity - self.index.residuals[position]
+        self.index.close(position)
+        self.num_closed += 1
+        return {"event": "close", "bin": self.bin_ids[position], "load": load, "items": self.contents.pop(position)}
+
+    def _compact(self):
+        """
+        Drops the closed bins from the index, so that its size follows the number of open bins rather than the number of
+        bins ever opened. The last bin is kept even if it is closed, so that NextFit still sees it, and the open bins
+        keep their relative order, so the heuristics make exactly the same choices as before.
+        """
+        last = len(self.index) - 1
+        keep = sorted(self.contents)
+        if last not in self.contents:
+            keep.append(last)
+        self.index.compact(keep)
+        self.bin_ids = [self.bin_ids[position] for position in keep]
+        self.contents = {i: self.contents[position] for i, position in enumerate(keep) if position in self.contents}
+
+    def stats(self):
+        """
+        Summarises the state of the packer and the latency of the most recent placements.
+        :return: A dictionary with the number of items and bins and the latency percentiles in microseconds.
+        """
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "items": self.num_items,
+            "open_bins": len(self.contents),
+            "closed_bins": self.num_closed,
+            "latency_us": {
+                "count": count,
+                "mean": sum(latencies) / count * 1e6 if count else None,
+                "p50": latencies[count // 2] * 1e6 if count else None,
+                "p99": latencies[min(count - 1, count * 99 // 100)] * 1e6 if count else None,
+                "max": latencies[-1] * 1e6 if count else None,
+            },
+        }
+
+
+class OnlinePackingService:
+    def __init__(self, packer):
+        """
+        Serves an OnlinePacker to asyncio code in the same process, and to other processes over a local socket.
+        :param packer: The OnlinePacker.
+        """
+        self.packer = packer
+        self.subscribers = []
+
+    def subscribe(self):
+        """
+        Subscribes to the open and close events of the bins.
+        :return: An asyncio.Queue that receives every event from now on.
+        """
+        queue = asyncio.Queue()
+        self.subscribers.append(queue)
+        return queue
+
+    def _publish(self, events):
+        for queue in self.subscribers:
+            for event in events:
+                queue.put_nowait(event)
+        return events
+
+    async def place(self, size):
+        """
+        Places an item in a bin.
+        :param size: The size of the item.
+        :return: A dictionary with the id of the item, the id of its bin and the events it caused.
+        """
+        item, position, events = self.packer.place(size)
+        return {"item": item, "bin": position, "events": self._publish(events)}
+
+    async def flush(self):
+        """
+        Closes every open bin.
+        :return: A dictionary with the close events.
+        """
+        return {"events": self._publish(self.packer.flush())}
+
+    def stats(self):
+        return self.packer.stats()
+
+    async def handle(self, reader, writer):
+        """
+        Handles a connection. Every line a client sends is a JSON request, {"size": size}, {"command": "flush"} or
+        {"command": "stats"}, and is answered with a line of JSON.
+        """
+        try:
+            async for line in reader:
+                try:
+                    request = json.loads(line)
+                    command = request.get("command", "place")
+                    if command == "place":
+                        response = await self.place(request["size"])
+                    elif command == "flush":
+                        response = await self.flush()
+                    elif command == "stats":
+                        response = self.stats()
+                    else:
+                        raise ValueError("Unknown command: {}".format(command))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    response = {"error": str(e)}
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, path=None):
+        """
+        Starts listening for connections on a local TCP port, or on a Unix socket if a path is given.
+        :return: The asyncio server.
+        """
+        if path:
+            return await asyncio.start_unix_server(self.handle, path=path)
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def main(args):
+    packer = OnlinePacker(args.capacity, args.pattern, args.max_open_bins, args.min_item_size)
+    service = OnlinePackingService(packer)
+    server = await service.serve(args.host, args.port, args.unix)
+    log("Packing with pattern {} on {}".format(args.pattern, args.unix or "{}:{}".format(args.host, args.port)))
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Packs items into bins as they arrive, using a heuristic pattern.")
+    parser.add_argument("capacity", type=int)
+    parser.add_argument("pattern")
+    parser.add_argument("--max-open-bins", type=int)
+    parser.add_argument("--min-item-size", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Listen on a Unix socket at this path instead of a TCP port.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,53 @@
+class UniformSelection:
+    def __init__(self, operators):
+        """
+        Picks move operators uniformly at random, and keeps statistics on how productive each operator is.
+        :param operators: The move operators to pick from.
+        """
+        self.operators = list(operators)
+        self.uses = [0] * len(self.operators)
+        self.tabu_hits = [0] * len(self.operators)
+        self.improvements = [0] * len(self.operators)
+
+    def select(self, rng):
+        """
+        Picks a move operator.
+        :param rng: The random number generator to draw from.
+        :return: The index of the operator in operators.
+        """
+        return rng.randrange(len(self.operators))
+
+    def reward(self, index, tabu=False, improved=False):
+        """
+        Records the outcome of applying an operator.
+        :param index: The index of the operator.
+        :param tabu: Whether the operator produced a tabu pattern, which was not evaluated.
+        :param improved: Whether the operator produced a pattern that improved on the current solution.
+        """
+        self.uses[index] += 1
+        self.tabu_hits[index] += tabu
+        self.improvements[index] += improved
+
+    def stats(self):
+        """
+        Summarises how often each operator was applied and what came of it.
+        :return: A dictionary mapping operator names to their statistics.
+        """
+        return {operator.__name__: {
+            "uses": self.uses[i],
+            "tabu_hits": self.tabu_hits[i],
+            "improvements": self.improvements[i],
+        } for i, operator in enumerate(self.operators)}
+
+    def state(self):
+        """
+        Captures the state of the selection in a form that can be written to JSON.
+        """
+        return {"uses": self.uses, "tabu_hits": self.tabu_hits, "improvements": self.improvements}
+
+    def restore(self, state):
+        """
+        Restores the output of state.
+        """
+        self.uses, self.tabu_hits, self.improvements = list(state["uses"]), list(state["tabu_hits"]), \
+            list(state["improvements"])
@@ -0,0 +1,46 @@
+from concurrent.futures import ProcessPoolExecutor
+from evaluation import Evaluator
+
+# The evaluator of a worker process. The sizes of the items are shipped to each worker once, when the worker starts.
+_evaluator = None
+
+
+def _initialise(capacity, sizes):
+    global _evaluator
+    _evaluator = Evaluator(capacity, sizes=sizes)
+
+
+def _evaluate(tasks):
+    return [_evaluator.evaluate(pattern, base, threshold) for pattern, base, threshold in tasks]
+
+
+class PoolEvaluator:
+    def __init__(self, capacity, sizes, workers):
+        """
+        Creates a pool of worker processes that evaluate patterns. Only patterns and (fitness, num_bins) tuples are sent
+        between processes.
+        :param capacity: The capacity of a bin.
+        :param sizes: The sizes of the items that have to be packed in bins.
+        :param workers: The number of worker processes.
+        """
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(workers, initializer=_initialise, initargs=(capacity, sizes))
+
+    def evaluate(self, patterns, bases=None, thresholds=None):
+        """
+        Evaluates a batch of patterns, split into one chunk per worker.
+        :param patterns: The patterns to evaluate.
+        :param bases: Optional patterns that the patterns were derived from, one per pattern.
+        :param thresholds: Optional fitness values to beat, one per pattern, for aborting evaluations early.
+        :return: A list of (fitness, num_bins) tuples, or None for aborted evaluations, one per pattern.
+        """
+        tasks = list(zip(patterns, bases or [None] * len(patterns), thresholds or [None] * len(patterns)))
+        chunk_size = -(-len(tasks) // self.workers) or 1
+        chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+        return [result for chunk in self.executor.map(_evaluate, chunks) for result in chunk]
+
+    def close(self):
+        """
+        Shuts the worker processes down.
+        """
+        self.executor.shutdown()
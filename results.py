@@ -0,0 +1,189 @@
+import argparse
+import gzip
+import json
+import os
+import zlib
+
+# Fields that can grow very large and are therefore kept out of the main results file.
+BULKY_FIELDS = ("tabu_list", "trace")
+# The number of bytes read from a compressed results file at a time.
+READ_SIZE = 1 << 16
+
+
+def _lines(path):
+    """
+    Reads the complete lines of a results file, compressed with gzip if its name ends with .gz. Reading stops at a line
+    that was cut off or at data that cannot be decompressed, which is what a campaign leaves behind when it is killed
+    while a record is being written.
+    :param path: The path of the file.
+    :return: A generator of lines, as bytes that end with a newline.
+    """
+    with open(path, "rb") as file:
+        if not path.endswith(".gz"):
+            for line in file:
+                if not line.endswith(b"\n"):
+                    return
+                yield line
+            return
+        # The file is made of one or more gzip members, the last of which may be incomplete.
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        data = buffer = b""
+        while True:
+            if not buffer:
+                buffer = file.read(READ_SIZE)
+                if not buffer:
+                    return
+            try:
+                data += decompressor.decompress(buffer)
+            except zlib.error:
+                return
+            buffer = b""
+            if decompressor.eof:
+                buffer = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            *lines, data = data.split(b"\n")
+            for line in lines:
+                yield line + b"\n"
+
+
+def _records(path):
+    """
+    Reads the records of a results file up to the first one that is incomplete.
+    :return: A generator of (line, record) tuples.
+    """
+    for line in _lines(path):
+        try:
+            yield line, json.loads(line)
+        except ValueError:
+            return
+
+
+def read_records(path):
+    """
+    Reads the records from a newline-delimited results file one at a time.
+    :param path: The path of the file.
+    :return: A generator of records.
+    """
+    if not os.path.exists(path):
+        return
+    for _, record in _records(path):
+        yield record
+
+
+def repair(path):
+    """
+    Cuts a results file back to its last complete record, so that the records appended when the campaign resumes
+    after a crash can be read. A compressed file whose last gzip member was cut off is rewritten with the complete
+    records only.
+    :param path: The path of the file.
+    """
+    if not os.path.exists(path):
+        return
+    if not path.endswith(".gz"):
+        size = sum(len(line) for line, _ in _records(path))
+        if size < os.path.getsize(path):
+            with open(path, "r+b") as file:
+                file.truncate(size)
+        return
+    lines = [line for line, _ in _records(path)]
+    try:
+        with gzip.open(path, "rb") as file:
+            intact = file.read() == b"".join(lines)
+    except (EOFError, OSError, zlib.error):
+        intact = False
+    if intact:
+        return
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        for line in lines:
+            file.write(gzip.compress(line))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+class ResultSink:
+    def __init__(self, path, side_path=None):
+        """
+        Creates a sink that appends one record per finished job to a newline-delimited JSON file. Bulky fields are
+        written to a separate side file, or dropped if no side file is given. A record that was cut off when an earlier
+        campaign was killed is removed first.
+        :param path: The path of the results file. If its name ends with .gz, every record is written as a separate
+        gzip member, so that a crash loses at most the record that was being written.
+        :param side_path: The optional path of the file for the bulky fields.
+        """
+        self.file = self._open(path)
+        self.side_file = self._open(side_path) if side_path else None
+
+    @staticmethod
+    def _open(path):
+        repair(path)
+        return open(path, "ab")
+
+    def write(self, job, results):
+        """
+        Writes the results of a job and flushes them to disk.
+        :param job: (dataset, algorithm, iteration, seed)
+        :param results: A dictionary mapping result names to summaries.
+        """
+        bulk = {}
+        for name, summary in results.items():
+            fields = {field: summary.pop(field) for field in BULKY_FIELDS if field in summary}
+            if fields:
+                bulk[name] = fields
+        if bulk and self.side_file:
+            self._append(self.side_file, {"job": job, "results": bulk})
+        self._append(self.file, {"job": job, "results": results})
+
+    @staticmethod
+    def _append(file, record):
+        data = (json.dumps(record) + "\n").encode()
+        file.write(gzip.compress(data) if file.name.endswith(".gz") else data)
+        file.flush()
+        os.fsync(file.fileno())
+
+    def close(self):
+        self.file.close()
+        if self.side_file:
+            self.side_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_results(path, side_path=None):
+    """
+    Aggregates the records of a results file into a list of data sets with the results of every algorithm, in the same
+    structure as the JSON files written by the original scripts.
+    :param path: The path of the results file.
+    :param side_path: The optional path of the file with the bulky fields, to merge them back in.
+    :return: [{"name": dataset, "results": {name: [summary, ...]}}, ...]
+    """
+    bulk = {tuple(record["job"]): record["results"] for record in read_records(side_path)} if side_path else {}
+    records = []
+    for record in read_records(path):
+        job = tuple(record["job"])
+        for name, fields in bulk.get(job, {}).items():
+            record["results"].get(name, {}).update(fields)
+        records.append((job, record["results"]))
+    # Jobs finish in any order, so sort them by iteration to restore the order of the original scripts.
+    records.sort(key=lambda record: record[0][2])
+    datasets = {}
+    for (dataset, _, _, _), results in records:
+        entry = datasets.setdefault(dataset, {"name": dataset, "results": {}})
+        for name, summary in results.items():
+            entry["results"].setdefault(name, []).append(summary)
+    return list(datasets.values())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Aggregates a results file into a single JSON document.")
+    parser.add_argument("path")
+    parser.add_argument("output")
+    parser.add_argument("--side")
+    args = parser.parse_args()
+    with open(args.output, "w") as file:
+        file.write(json.dumps(load_results(args.path, args.side), indent=2))
@@ -0,0 +1,31 @@
+import random
+
+
+def make_rng(seed=None):
+    """
+    Creates an independent random number generator for a single run, so that runs in the same process or in parallel
+    processes never share a stream.
+    :param seed: The seed. A random seed is drawn from the operating system if none is given.
+    :return: A random.Random instance.
+    """
+    return random.Random(seed)
+
+
+def spawn(seed, key):
+    """
+    Derives an independent stream from a seed and a key, e.g. the seed of a run and the number of a worker or island.
+    String seeds are hashed with SHA-512, so streams with different keys are unrelated.
+    :param seed: The seed of the parent stream.
+    :param key: The key that distinguishes the child stream.
+    :return: A random.Random instance.
+    """
+    return random.Random("{}:{}".format(seed, key))
+
+
+def draw_seed(rng=random):
+    """
+    Draws a seed from a generator, to be recorded and used to create another generator.
+    :param rng: The generator to draw from. Defaults to the global random module.
+    :return: A 64-bit seed.
+    """
+    return rng.getrandbits(64)
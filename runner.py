@@ -0,0 +1,335 @@
+from array import array
+from bin import Bin
+from dataset_registry import DatasetRegistry
+from evaluation_store import EvaluationStore
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from fitness_cache import FitnessCache
+from genetic_algorithm import GeneticAlgorithm
+from heuristics import BestFit, FirstFit, NextFit, WorstFit
+from instrumentation import Instrumentation, SamplingProfiler
+from item import Item
+from island_model import IslandModel
+from results import ResultSink, read_records
+from rng import draw_seed, make_rng
+from snapshots import Snapshotter
+from tabu_memory import make_tabu_list
+from tabu_search import TabuSearch
+import argparse
+import os
+import zlib
+
+ITERATIONS = 30
+
+
+def log(message, end=None):
+    print(message, flush=True, end=end)
+
+
+registry = DatasetRegistry()
+
+
+def make_snapshotter(options):
+    if not options.get("snapshot_path"):
+        return None
+    return Snapshotter(options["snapshot_path"], options.get("snapshot_interval"))
+
+
+def snapshot_path(snapshot_dir, job):
+    """
+    Gets the path of the snapshot file of a job.
+    :param snapshot_dir: The directory that holds the snapshots.
+    :param job: (dataset, algorithm, iteration, seed)
+    :return: The path.
+    """
+    return os.path.join(snapshot_dir, "{}-{}-{}-{}.json".format(*job))
+
+
+def make_instrumentation(options):
+    return Instrumentation() if options.get("instrument") else None
+
+
+def add_instrumentation(summary, instrumentation):
+    """
+    Adds the counters and timers of a run to its summary. The trace is added as a separate field, so that it is written
+    to the side file with the other bulky fields.
+    """
+    if instrumentation is not None:
+        exported = instrumentation.export()
+        summary["trace"] = exported.pop("trace")
+        summary["instrumentation"] = exported
+    return summary
+
+
+def run_low_level(capacity, sizes, options):
+    """
+    Applies each low-level heuristic to the items on its own.
+    :param sizes: The sizes of the items, in the order in which they are packed.
+    :return: A dictionary mapping the name of each heuristic to its summary.
+    """
+    items = [Item(size) for size in sizes]
+    summaries = {}
+    for h in [FirstFit, NextFit, WorstFit, BestFit]:
+        start_time = datetime.now()
+        # There is always at least one bin.
+        bins = [Bin(capacity=capacity)]
+        for item in items:
+            bins = h.apply(item, bins)
+        execution_time = datetime.now() - start_time
+        summaries[h.__name__] = {
+            "execution_time": str(execution_time),
+            "num_bins": len(bins),
+            "fitness": sum(b.fitness() for b in bins) / len(bins),
+        }
+    return summaries
+
+
+def run_tabu_search(capacity, sizes, options):
+    """
+    Runs the tabu search algorithm on the items.
+    :param sizes: The sizes of the items, in the order in which they are packed.
+    :param options: May contain "tabu_list" (a mode for make_tabu_list), "tabu_tenure", "lower_bound", "early_abort",
+    "instrument", "neighbourhood_size", "tabu_workers", "time_budget", "snapshot_path" and "snapshot_interval".
+    :return: A dictionary mapping "TabuSearch" to the summary of the run.
+    """
+    tabu_mode = options.get("tabu_list", "unlimited")
+    instrumentation = make_instrumentation(options)
+    thing = TabuSearch(capacity, sizes=sizes, cache=options.get("cache"), rng=options.get("rng"),
+                       tabu_list=make_tabu_list(tabu_mode, options.get("tabu_tenure")),
+                       lower_bound=options.get("lower_bound"), early_abort=options.get("early_abort", False),
+                       instrumentation=instrumentation, neighbourhood_size=options.get("neighbourhood_size"),
+                       workers=options.get("tabu_workers"), snapshotter=make_snapshotter(options))
+    start_time = datetime.now()
+    total_iterations, stagnation, combination = thing.run(options.get("time_budget"))
+    execution_time = datetime.now() - start_time
+    return {"TabuSearch": add_instrumentation({
+        "execution_time": str(execution_time),
+        "num_bins": thing.num_bins,
+        "fitness": thing.fitness,
+        "iterations": total_iterations,
+        "stagnation": stagnation,
+        "combination": combination,
+        "tabu_list_mode": tabu_mode,
+        "neighbourhood_size": thing.neighbourhood_size or 1,
+        "tabu_workers": options.get("tabu_workers") or 1,
+        "operators": thing.operator_selection.stats(),
+        "tabu_list": list(thing.tabu_list),
+        "cache": thing.cache.stats(),
+        "evaluation": thing.evaluator.stats(),
+    }, instrumentation)}
+
+
+def run_ga(capacity, sizes, options):
+    """
+    Runs the genetic algorithm on the items.
+    :param sizes: The sizes of the items, in the order in which they are packed.
+    :param options: May contain "lower_bound", "early_abort", "instrument", "time_budget", "snapshot_path" and
+    "snapshot_interval".
+    :return: A dictionary mapping "GA" to the summary of the run.
+    """
+    instrumentation = make_instrumentation(options)
+    thing = GeneticAlgorithm(capacity, sizes=sizes, cache=options.get("cache"), rng=options.get("rng"),
+                             lower_bound=options.get("lower_bound"),
+                             early_abort=options.get("early_abort", False), instrumentation=instrumentation,
+                             snapshotter=make_snapshotter(options))
+    start_time = datetime.now()
+    total_iterations, stagnation = thing.run(options.get("time_budget"))
+    execution_time = datetime.now() - start_time
+    return {"GA": add_instrumentation({
+        "execution_time": str(execution_time),
+        "num_bins": thing.best_solution.num_bins,
+        "fitness": thing.best_solution.fitness,
+        "iterations": total_iterations,
+        "stagnation": stagnation,
+        "combination": thing.best_solution.pattern,
+        "cache": thing.cache.stats(),
+        "evaluation": thing.evaluator.stats() if thing.evaluator else None,
+    }, instrumentation)}
+
+
+def run_island_ga(capacity, sizes, options):
+    """
+    Runs the island model of the genetic algorithm on the items, with one process per island.
+    :param sizes: The sizes of the items, in the order in which they are packed.
+    :param options: May contain "islands", "topology", "migration_interval", "lower_bound" and "early_abort".
+    :return: A dictionary mapping "IslandGA" to the summary of the run.
+    """
+    seed = draw_seed(options["rng"]) if options.get("rng") else None
+    thing = IslandModel(capacity, sizes=sizes, islands=options.get("islands"), topology=options.get("topology", "ring"),
+                        interval=options.get("migration_interval"), seed=seed, lower_bound=options.get("lower_bound"),
+                        early_abort=options.get("early_abort", False))
+    start_time = datetime.now()
+    total_iterations, stagnation = thing.run()
+    execution_time = datetime.now() - start_time
+    return {"IslandGA": {
+        "execution_time": str(execution_time),
+        "num_bins": thing.best_solution.num_bins,
+        "fitness": thing.best_solution.fitness,
+        "iterations": total_iterations,
+        "stagnation": stagnation,
+        "combination": thing.best_solution.pattern,
+        "islands": thing.num_islands,
+        "topology": thing.topology,
+        "migration_interval": thing.interval,
+        "island_seed": thing.seed,
+    }}
+
+
+algorithms = {
+    "low_level": run_low_level,
+    "TabuSearch": run_tabu_search,
+    "GA": run_ga,
+    "IslandGA": run_island_ga,
+}
+
+
+def job_seed(base_seed, dataset, algorithm, iteration):
+    """
+    Derives the seed of a single job, so that every job can be replayed on its own.
+    :return: The seed.
+    """
+    return zlib.crc32("{}:{}:{}:{}".format(base_seed, dataset, algorithm, iteration).encode())
+
+
+def run_job(job, options=None):
+    """
+    Runs a single job with its own random number generator, seeded with the seed of the job, so the job does not depend
+    on which process runs it or on the jobs that ran before it, and can be replayed from the seed in its results.
+    :param job: (dataset, algorithm, iteration, seed)
+    :param options: An optional dictionary of algorithm options. Unless "stop_at_lower_bound" is False, the searches stop
+    as soon as they reach the lower bound on the number of bins. If "profile" is set, the job is sampled with a
+    SamplingProfiler and its hottest functions are added to every summary. If "snapshot_dir" is set, the searches
+    write snapshots of their state there and resume from them when the job is run again. If "store" is set, the
+    searches share their evaluations with every other job through the EvaluationStore at that path.
+    :return: The job and a dictionary mapping result names to summaries.
+    """
+    dataset, algorithm, iteration, seed = job
+    rng = make_rng(seed)
+    instance = registry.get(dataset)
+    # The sizes are copied out of the memory-mapped cache once, into an array that the searches and their evaluators
+    # share. No Item objects are created unless a search needs them.
+    capacity, sizes, lower_bound = instance.capacity, array("q", instance.sizes), instance.lower_bound
+    options = dict(options or {})
+    options["rng"] = rng
+    if options.get("stop_at_lower_bound", True):
+        options["lower_bound"] = lower_bound
+    if options.get("snapshot_dir"):
+        options["snapshot_path"] = snapshot_path(options["snapshot_dir"], job)
+    store = EvaluationStore(options["store"]) if options.get("store") else None
+    if store is not None:
+        options["cache"] = FitnessCache(store=store)
+    # Randomize the order of the items in the item list.
+    rng.shuffle(sizes)
+    try:
+        if options.get("profile"):
+            with SamplingProfiler() as profiler:
+                results = algorithms[algorithm](capacity, sizes, options)
+            for summary in results.values():
+                summary["profile"] = profiler.export()
+        else:
+            results = algorithms[algorithm](capacity, sizes, options)
+    finally:
+        if store is not None:
+            store.close()
+    for summary in results.values():
+        summary["seed"] = seed
+        summary["lower_bound"] = lower_bound
+        summary["gap"] = summary["num_bins"] - lower_bound
+    return job, results
+
+
+def run_campaign(algorithm_names, output, iterations=ITERATIONS, datasets=None, workers=None, base_seed=0,
+                 side_output=None, options=None):
+    """
+    Runs every iteration of every algorithm on every data set on a pool of worker processes. Each finished job is
+    streamed to the output file as soon as it completes, so that an interrupted campaign continues where it stopped. A
+    job that fails is logged and left out of the output file, so that it runs again when the campaign is resumed.
+    :param algorithm_names: The names of the algorithms to run, as keys of the algorithms dictionary.
+    :param output: The path of the newline-delimited JSON file to append the results to. The file is compressed with
+    gzip if its name ends with .gz.
+    :param iterations: The number of independent iterations per algorithm and data set.
+    :param datasets: The names of the data sets to use. Defaults to every data set in the registry.
+    :param workers: The number of worker processes. Defaults to the number of CPUs.
+    :param base_seed: The seed from which the seed of every job is derived.
+    :param side_output: The optional path of the file to write bulky fields, such as the tabu list, to.
+    :param options: An optional dictionary of algorithm options that is passed to every job.
+    """
+    datasets = datasets or registry.names()
+    # Convert any new data sets before the workers start, so that they only have to map the cache.
+    for dataset in datasets:
+        registry.get(dataset)
+    jobs = [(dataset, algorithm, iteration, job_seed(base_seed, dataset, algorithm, iteration))
+            for dataset in datasets for algorithm in algorithm_names for iteration in range(iterations)]
+    completed = {tuple(record["job"]) for record in read_records(output)}
+    pending = [job for job in jobs if job not in completed]
+    log("{} jobs, {} already completed".format(len(jobs), len(jobs) - len(pending)))
+    workers = workers or os.cpu_count()
+    snapshot_dir = (options or {}).get("snapshot_dir")
+    if snapshot_dir:
+        os.makedirs(snapshot_dir, exist_ok=True)
+    with ResultSink(output, side_output) as sink, ProcessPoolExecutor(workers) as executor:
+        # Only a couple of jobs per worker are submitted at a time, so finished results do not pile up in memory.
+        pending = iter(pending)
+        running = {}
+        failed = 0
+        while True:
+            for job in pending:
+                running[executor.submit(run_job, job, options)] = job
+                if len(running) >= 2 * workers:
+                    break
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    job, results = future.result()
+                except Exception as e:
+                    # The job is not recorded, so it runs again when the campaign is resumed.
+                    failed += 1
+                    log("  {} {} iteration {} failed: {!r}".format(job[0], job[1], job[2] + 1, e))
+                    continue
+                sink.write(job, results)
+                if snapshot_dir and os.path.exists(snapshot_path(snapshot_dir, job)):
+                    os.remove(snapshot_path(snapshot_dir, job))
+                completed.add(job)
+                log("  {} {} iteration {} done ({}/{})".format(job[0], job[1], job[2] + 1, len(completed), len(jobs)))
+    if failed:
+        log("{} jobs failed and will run again when the campaign is resumed".format(failed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Runs a campaign of bin-packing experiments.")
+    parser.add_argument("algorithms", nargs="+", choices=sorted(algorithms))
+    parser.add_argument("--output", default="results.jsonl")
+    parser.add_argument("--side-output")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--datasets", nargs="*")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tabu-list", choices=["unlimited", "fifo", "hashed", "bloom"], default="unlimited")
+    parser.add_argument("--tabu-tenure", type=int)
+    parser.add_argument("--no-lower-bound-stop", dest="stop_at_lower_bound", action="store_false")
+    parser.add_argument("--early-abort", action="store_true")
+    parser.add_argument("--neighbourhood-size", type=int, help="Evaluate this many tabu search neighbours per iteration.")
+    parser.add_argument("--tabu-workers", type=int,
+                        help="Evaluate the neighbours of each tabu search iteration on this many processes per job.")
+    parser.add_argument("--time-budget", type=float, help="Stop each tabu search or GA run after this many seconds.")
+    parser.add_argument("--snapshot-dir", help="Snapshot long searches here, so that killed jobs resume.")
+    parser.add_argument("--snapshot-interval", type=float, help="The number of seconds between snapshots.")
+    parser.add_argument("--store", help="Share evaluations between jobs and campaigns in this SQLite database.")
+    parser.add_argument("--islands", type=int, help="The number of islands of IslandGA.")
+    parser.add_argument("--topology", choices=["ring", "complete", "star"], default="ring")
+    parser.add_argument("--migration-interval", type=int)
+    parser.add_argument("--instrument", action="store_true", help="Record counters, timers and a trace of each run.")
+    parser.add_argument("--profile", action="store_true", help="Sample the hottest functions of each run.")
+    args = parser.parse_args()
+    run_campaign(args.algorithms, args.output, args.iterations, args.datasets, args.workers, args.seed,
+                 args.side_output, {"tabu_list": args.tabu_list, "tabu_tenure": args.tabu_tenure,
+                                    "stop_at_lower_bound": args.stop_at_lower_bound, "early_abort": args.early_abort,
+                                    "instrument": args.instrument, "profile": args.profile,
+                                    "neighbourhood_size": args.neighbourhood_size, "tabu_workers": args.tabu_workers,
+                                    "islands": args.islands, "topology": args.topology,
+                                    "migration_interval": args.migration_interval,
+                                    "time_budget": args.time_budget, "snapshot_dir": args.snapshot_dir,
+                                    "snapshot_interval": args.snapshot_interval, "store": args.store})
@@ -0,0 +1,92 @@
+import json
+import os
+import random
+import time
+
+# The version of the snapshot format. Snapshots written with another version are ignored.
+VERSION = 1
+
+
+def rng_state(rng=random):
+    """
+    Captures the state of a random number generator in a form that can be written to JSON.
+    :param rng: A random.Random instance, or the global random module.
+    """
+    version, internal_state, gauss_next = rng.getstate()
+    return [version, list(internal_state), gauss_next]
+
+
+def restore_rng_state(state, rng=random):
+    """
+    Restores a random number generator from the output of rng_state.
+    :param state: The output of rng_state.
+    :param rng: A random.Random instance, or the global random module.
+    """
+    version, internal_state, gauss_next = state
+    rng.setstate((version, tuple(internal_state), gauss_next))
+
+
+class Snapshotter:
+    INTERVAL = 5.0
+
+    def __init__(self, path, interval=None):
+        """
+        Writes snapshots of the state of a search to a file at regular intervals, so that the search can be resumed if
+        the process is killed.
+        :param path: The path of the snapshot file.
+        :param interval: The minimum number of seconds between two snapshots.
+        """
+        self.path = path
+        self.interval = self.INTERVAL if interval is None else interval
+        self.last_write = time.monotonic()
+
+    def due(self):
+        """
+        Checks whether it is time to write another snapshot.
+        :return: True if the interval has passed since the last snapshot, False otherwise.
+        """
+        return time.monotonic() - self.last_write >= self.interval
+
+    def write(self, kind, fingerprint, state):
+        """
+        Writes a snapshot atomically, so that the file always holds either the previous or the new snapshot.
+        :param kind: The name of the search, e.g. "TabuSearch".
+        :param fingerprint: The item fingerprint of the instance that is searched.
+        :param state: A dictionary with the state of the search.
+        """
+        temporary = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(temporary, "w") as file:
+            json.dump({"version": VERSION, "kind": kind, "fingerprint": fingerprint, "state": state}, file,
+                      separators=(",", ":"))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+        self.last_write = time.monotonic()
+
+    def read(self, kind, fingerprint):
+        """
+        Reads the last snapshot, if there is one. A snapshot that was written with another version, or by another
+        search, is stale: it is removed and the search starts from scratch.
+        :param kind: The name of the search that is resumed.
+        :param fingerprint: The item fingerprint of the instance that is searched.
+        :return: The state of the search, or None if there is no snapshot of this search.
+        """
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r") as file:
+                snapshot = json.load(file)
+        except ValueError:
+            snapshot = {}
+        if snapshot.get("version") != VERSION or snapshot.get("kind") != kind \
+                or snapshot.get("fingerprint") != fingerprint:
+            self.remove()
+            return None
+        return snapshot["state"]
+
+    def remove(self):
+        """
+        Removes the snapshot file, e.g. once the results of the search have been saved.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
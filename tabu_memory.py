@@ -0,0 +1,158 @@
+from collections import deque
+from math import log
+import hashlib
+
+
+def fingerprint(pattern):
+    """
+    Computes a compact 64-bit fingerprint of a pattern that is stable across processes.
+    :param pattern: The pattern.
+    :return: The fingerprint as an integer.
+    """
+    return int.from_bytes(hashlib.blake2b(pattern.encode(), digest_size=8).digest(), "little")
+
+
+class FifoTabuList:
+    def __init__(self, tenure, hashed=False):
+        """
+        Creates a tabu list that remembers only the most recently added patterns. Once it is full, adding a pattern
+        expires the oldest one.
+        :param tenure: The number of patterns to remember.
+        :param hashed: Whether to store 64-bit fingerprints instead of the pattern strings.
+        """
+        self.tenure = tenure
+        self.hashed = hashed
+        self.ring = deque()
+        self.members = set()
+
+    def _key(self, pattern):
+        return fingerprint(pattern) if self.hashed else pattern
+
+    def __contains__(self, pattern):
+        return self._key(pattern) in self.members
+
+    def __len__(self):
+        return len(self.ring)
+
+    def __iter__(self):
+        return iter(self.ring)
+
+    def add(self, pattern):
+        """
+        Adds a pattern to the tabu list, expiring the oldest pattern if the tenure has been reached.
+        :param pattern: The pattern to add.
+        """
+        key = self._key(pattern)
+        if key in self.members:
+            return
+        self.ring.append(key)
+        self.members.add(key)
+        if len(self.ring) > self.tenure:
+            self.members.discard(self.ring.popleft())
+
+
+class BloomTabuList:
+    def __init__(self, tenure, error_rate=0.001):
+        """
+        Creates a tabu list backed by two generations of Bloom filters, each holding up to tenure patterns. When the
+        current generation is full, the previous one is discarded, so every pattern stays tabu for between tenure and
+        2 * tenure additions. Membership checks can report false positives at roughly the given error rate, but never
+        false negatives.
+        :param tenure: The number of patterns per generation.
+        :param error_rate: The target false-positive rate of a full generation.
+        """
+        self.tenure = tenure
+        # The optimal number of bits and hash functions for the given number of patterns and error rate.
+        self.num_bits = max(8, int(-tenure * log(error_rate) / (log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / tenure * log(2)))
+        self.current = bytearray((self.num_bits + 7) // 8)
+        self.previous = bytearray(len(self.current))
+        self.count = 0
+
+    def _positions(self, pattern):
+        digest = hashlib.blake2b(pattern.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    @staticmethod
+    def _test(bits, positions):
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def __contains__(self, pattern):
+        positions = self._positions(pattern)
+        return self._test(self.current, positions) or self._test(self.previous, positions)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        # The patterns themselves are not stored.
+        return iter(())
+
+    def add(self, pattern):
+        """
+        Adds a pattern to the current generation, starting a new generation if it is full.
+        :param pattern: The pattern to add.
+        """
+        if self.count >= self.tenure:
+            self.previous, self.current = self.current, bytearray(len(self.current))
+            self.count = 0
+        for p in self._positions(pattern):
+            self.current[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+def make_tabu_list(mode="unlimited", tenure=None):
+    """
+    Creates a tabu list.
+    :param mode: "unlimited" for a set of every pattern ever added (the original behaviour), "fifo" for the most recent
+    patterns, "hashed" for the fingerprints of the most recent patterns, or "bloom" for Bloom filters.
+    :param tenure: The number of patterns a bounded tabu list remembers.
+    :return: The tabu list.
+    """
+    if mode == "unlimited":
+        return set()
+    if tenure is None:
+        raise ValueError("A tenure is required for a {} tabu list".format(mode))
+    if mode == "fifo":
+        return FifoTabuList(tenure)
+    if mode == "hashed":
+        return FifoTabuList(tenure, hashed=True)
+    if mode == "bloom":
+        return BloomTabuList(tenure)
+    raise ValueError("Unknown tabu list mode: {}".format(mode))
+
+
+def tabu_list_state(tabu_list):
+    """
+    Captures the contents of a tabu list in a form that can be written to JSON.
+    :param tabu_list: A tabu list created with make_tabu_list.
+    :return: A dictionary with the mode and contents of the tabu list.
+    """
+    if isinstance(tabu_list, FifoTabuList):
+        return {"mode": "hashed" if tabu_list.hashed else "fifo", "tenure": tabu_list.tenure, "ring": list(tabu_list.ring)}
+    if isinstance(tabu_list, BloomTabuList):
+        return {"mode": "bloom", "tenure": tabu_list.tenure, "num_bits": tabu_list.num_bits,
+                "num_hashes": tabu_list.num_hashes, "current": tabu_list.current.hex(),
+                "previous": tabu_list.previous.hex(), "count": tabu_list.count}
+    return {"mode": "unlimited", "patterns": sorted(tabu_list)}
+
+
+def restore_tabu_list(state):
+    """
+    Recreates a tabu list from the output of tabu_list_state.
+    :param state: The state of the tabu list.
+    :return: The tabu list.
+    """
+    if state["mode"] == "unlimited":
+        return set(state["patterns"])
+    if state["mode"] == "bloom":
+        tabu_list = BloomTabuList.__new__(BloomTabuList)
+        tabu_list.tenure, tabu_list.num_bits, tabu_list.num_hashes = state["tenure"], state["num_bits"], state["num_hashes"]
+        tabu_list.current, tabu_list.previous = bytearray.fromhex(state["current"]), bytearray.fromhex(state["previous"])
+        tabu_list.count = state["count"]
+        return tabu_list
+    tabu_list = make_tabu_list(state["mode"], state["tenure"])
+    tabu_list.ring.extend(state["ring"])
+    tabu_list.members.update(state["ring"])
+    return tabu_list
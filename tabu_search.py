@@ -1,13 +1,26 @@
-from bin import Bin
+from array import array
+from anytime import Incumbent, expired, make_deadline
+from bin_index import IndexedBins
+from evaluation import Evaluator
+from fitness_cache import FitnessCache, canonical_pattern, item_fingerprint
 from heuristics import BestFit, FirstFit, NextFit, WorstFit
+from instrumentation import NULL_INSTRUMENTATION
+from item import Item
 from move_operators import Add, Change, Remove, Swap
+from operator_selection import UniformSelection
+from parallel_evaluation import PoolEvaluator
+from snapshots import restore_rng_state, rng_state
+from tabu_memory import restore_tabu_list, tabu_list_state
 import random
+import time
 
 
 class TabuSearch:
     MAX_COMBINATION_LENGTH = 10
     MAX_ITERATIONS = 5000
     MAX_NO_CHANGE = 1000
+    # The number of moves drawn per neighbour in the batch neighbourhood, to give up when most moves are tabu.
+    SAMPLE_ATTEMPTS = 4
     heuristic_map = {
         "f": FirstFit,
         "n": NextFit,
@@ -16,44 +29,236 @@ class TabuSearch:
     }
     movers = [Add, Change, Remove, Swap]
 
-    def __init__(self, capacity, items):
+    def __init__(self, capacity, items=None, cache=None, tabu_list=None, lower_bound=None, early_abort=False,
+                 instrumentation=None, neighbourhood_size=None, workers=None, snapshotter=None, rng=None,
+                 sizes=None):
         """
         Creates an instance that can run the tabu search algorithm.
         :param capacity: The capacity of a bin.
-        :param items: The items that have to be packed in bins.
+        :param items: The items that have to be packed in bins, or None if sizes is given.
+        :param cache: An optional FitnessCache to share between runs.
+        :param tabu_list: An optional tabu list created with make_tabu_list. Defaults to an unlimited set.
+        :param lower_bound: An optional lower bound on the number of bins. The search stops as soon as it is reached.
+        :param early_abort: Whether to stop packing a candidate as soon as it provably cannot beat the current solution.
+        :param instrumentation: Optional Instrumentation to record counters, timers and a trace of improvements in.
+        :param neighbourhood_size: If greater than 1, every iteration samples this many distinct non-tabu neighbours,
+        evaluates them together and moves to the best one if it improves on the current solution. Otherwise every
+        iteration evaluates a single random neighbour.
+        :param workers: The number of worker processes to evaluate the neighbours of an iteration with. Evaluation
+        happens in this process if this is not greater than 1, or if there is no neighbourhood_size.
+        :param snapshotter: An optional Snapshotter to write the state of the search to at regular intervals. If it holds
+        a snapshot already, the search resumes from it and continues exactly as the interrupted search would have.
+        :param rng: The random number generator to draw from, e.g. one created with make_rng. Defaults to the global
+        random module.
+        :param sizes: The sizes of the items instead of the items, e.g. the memory-mapped array of a Dataset, so that no
+        Item objects are created unless the bins of the solution are asked for. The sizes are not copied.
         """
         self.bin_capacity = capacity
-        self.items = items
+        self.rng = rng or random
+        self.sizes = sizes if sizes is not None else array("q", (item.size for item in items))
+        self._items = items
+        self.cache = cache if cache is not None else FitnessCache()
+        self.fingerprint = item_fingerprint(capacity, self.sizes)
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+        if self.instrumentation.enabled:
+            self.heuristic_map = self.instrumentation.wrap_heuristics(self.heuristic_map)
+        self.evaluator = Evaluator(capacity, sizes=self.sizes, instrumentation=instrumentation)
         self.fitness = 0
-        self.bins = [Bin(capacity)]
-        self.tabu_list = set()
+        self.combination = None
+        self.bins = IndexedBins(capacity)
+        self.num_bins = len(self.bins)
+        self.tabu_list = tabu_list if tabu_list is not None else set()
+        self.lower_bound = lower_bound
+        self.early_abort = early_abort
+        self.neighbourhood_size = neighbourhood_size if neighbourhood_size and neighbourhood_size > 1 else None
+        self.pool = PoolEvaluator(capacity, self.sizes, workers) \
+            if workers and workers > 1 and self.neighbourhood_size else None
+        self.snapshotter = snapshotter
+        self.operator_selection = UniformSelection(self.movers)
 
-    def run(self):
+    def run(self, budget=None, deadline=None):
         """
         Runs the tabu search algorithm and returns the results at the end of the process.
+        :param budget: An optional number of seconds that the run may take.
+        :param deadline: An optional time.monotonic() by which the run has to stop.
         :return: (num_iterations, num_no_changes, chosen_combination)
         """
-        combination = "".join(
-            [random.choice(list(self.heuristic_map.keys())) for _ in range(random.randrange(self.MAX_COMBINATION_LENGTH) or 1)])
-        self.bins = self.generate_solution(combination)
-        self.fitness = sum(b.fitness() for b in self.bins) / len(self.bins)
-        self.tabu_list.add(combination)
-        current_iteration = 0
-        num_no_change = 0
-        while num_no_change < self.MAX_NO_CHANGE and current_iteration < self.MAX_ITERATIONS:
-            new_combination = self.apply_move_operator(combination)
-            if new_combination not in self.tabu_list:
-                self.tabu_list.add(new_combination)
-                solution = self.generate_solution(new_combination)
-                fitness = sum(b.fitness() for b in solution) / len(solution)
-                if fitness > self.fitness:
-                    self.bins = solution
-                    self.fitness = fitness
+        for _ in self.iterate(budget, deadline):
+            pass
+        return self.num_iterations, self.num_no_change, self.combination
+
+    def iterate(self, budget=None, deadline=None, stop=None):
+        """
+        Runs the tabu search algorithm, yielding the initial solution and every improvement on it as soon as it is
+        found. The deadline is checked before every iteration, so the run overshoots it by at most one iteration.
+        :param budget: An optional number of seconds that the run may take.
+        :param deadline: An optional time.monotonic() by which the run has to stop.
+        :param stop: An optional threading.Event that stops the run when it is set. It is checked with the deadline.
+        :return: A generator of Incumbent tuples.
+        """
+        start_time = time.monotonic()
+        deadline = make_deadline(start_time, budget, deadline)
+        state = self.snapshotter.read("TabuSearch", self.fingerprint) if self.snapshotter is not None else None
+        if state is not None:
+            self.restore(state)
+            combination = self.combination
+        else:
+            length = self.rng.randrange(self.MAX_COMBINATION_LENGTH) or 1
+            combination = "".join(self.rng.choices(list(self.heuristic_map), k=length))
+            self.fitness, self.num_bins = self.evaluate(combination)
+            self.bins = None
+            self.tabu_list.add(combination)
+            self.num_iterations, self.num_no_change, self.combination = 0, 0, combination
+            if self.snapshotter is not None:
+                self.snapshotter.write("TabuSearch", self.fingerprint, self.snapshot())
+        try:
+            yield Incumbent(combination, self.fitness, self.num_bins, time.monotonic() - start_time)
+            current_iteration = self.num_iterations
+            num_no_change = self.num_no_change
+            instrumentation = self.instrumentation
+            while num_no_change < self.MAX_NO_CHANGE and current_iteration < self.MAX_ITERATIONS \
+                    and not self.reached_lower_bound() and not expired(deadline, stop):
+                if self.neighbourhood_size:
+                    new_combination, result = self.best_neighbour(combination)
+                else:
+                    new_combination, result = self.random_neighbour(combination)
+                improved = result is not None and result[0] > self.fitness
+                if improved:
+                    # Only the fitness and number of bins are kept. The bins are packed when they are asked for.
+                    self.fitness, self.num_bins = result
+                    self.bins = None
                     num_no_change = 0
-                    combination = new_combination
-            current_iteration += 1
-            num_no_change += 1
-        return current_iteration, num_no_change, combination
+                    combination = self.combination = new_combination
+                    instrumentation.count("improvements")
+                    instrumentation.trace(iteration=current_iteration, fitness=self.fitness, num_bins=self.num_bins,
+                                          combination=combination)
+                current_iteration += 1
+                num_no_change += 1
+                self.num_iterations, self.num_no_change, self.combination = current_iteration, num_no_change, combination
+                if self.snapshotter is not None and self.snapshotter.due():
+                    self.snapshotter.write("TabuSearch", self.fingerprint, self.snapshot())
+                if improved:
+                    yield Incumbent(combination, self.fitness, self.num_bins, time.monotonic() - start_time)
+            if self.snapshotter is not None:
+                self.snapshotter.write("TabuSearch", self.fingerprint, self.snapshot())
+        finally:
+            self.close()
+
+    def snapshot(self):
+        """
+        Captures the state of the search between two iterations.
+        :return: A dictionary that can be written to JSON.
+        """
+        return {
+            "combination": self.combination,
+            "fitness": self.fitness,
+            "num_bins": self.num_bins,
+            "iterations": self.num_iterations,
+            "no_change": self.num_no_change,
+            "tabu_list": tabu_list_state(self.tabu_list),
+            "rng": rng_state(self.rng),
+            "operators": self.operator_selection.state(),
+        }
+
+    def restore(self, state):
+        """
+        Restores the state of the search from a snapshot. The bins are packed again from the combination when they are
+        asked for.
+        :param state: The output of snapshot.
+        """
+        self.combination, self.fitness, self.num_bins = state["combination"], state["fitness"], state["num_bins"]
+        self.num_iterations, self.num_no_change = state["iterations"], state["no_change"]
+        self.tabu_list = restore_tabu_list(state["tabu_list"])
+        self.bins = None
+        restore_rng_state(state["rng"], self.rng)
+        if "operators" in state:
+            self.operator_selection.restore(state["operators"])
+
+    def random_neighbour(self, combination):
+        """
+        Applies a random move operator to the current combination and evaluates the result unless it is tabu.
+        :param combination: The current combination.
+        :return: (neighbour, (fitness, num_bins)), where the result is None if the neighbour is tabu or its evaluation
+        was aborted.
+        """
+        with self.instrumentation.time("move"):
+            operator = self.operator_selection.select(self.rng)
+            new_combination = self.apply_move_operator(combination, operator)
+        if new_combination in self.tabu_list:
+            self.instrumentation.count("tabu_rejections")
+            self.operator_selection.reward(operator, tabu=True)
+            return new_combination, None
+        self.tabu_list.add(new_combination)
+        with self.instrumentation.time("evaluate"):
+            result = self.evaluate(new_combination, combination, self.fitness if self.early_abort else None)
+        self.operator_selection.reward(operator, improved=result is not None and result[0] > self.fitness)
+        return new_combination, result
+
+    def best_neighbour(self, combination):
+        """
+        Samples up to neighbourhood_size distinct non-tabu neighbours of the current combination with random move
+        operators, makes them all tabu and evaluates them together.
+        :param combination: The current combination.
+        :return: (neighbour, (fitness, num_bins)) for the best neighbour, or (None, None) if every neighbour was tabu or
+        aborted.
+        """
+        neighbours, operators = [], []
+        with self.instrumentation.time("move"):
+            for _ in range(self.neighbourhood_size * self.SAMPLE_ATTEMPTS):
+                operator = self.operator_selection.select(self.rng)
+                new_combination = self.apply_move_operator(combination, operator)
+                if new_combination in self.tabu_list or new_combination in neighbours:
+                    self.instrumentation.count("tabu_rejections")
+                    self.operator_selection.reward(operator, tabu=True)
+                    continue
+                self.tabu_list.add(new_combination)
+                neighbours.append(new_combination)
+                operators.append(operator)
+                if len(neighbours) == self.neighbourhood_size:
+                    break
+        with self.instrumentation.time("evaluate"):
+            results = self.evaluate_neighbours(neighbours, combination)
+        best, best_result = None, None
+        for neighbour, result in zip(neighbours, results):
+            if result is not None and (best_result is None or result[0] > best_result[0]):
+                best, best_result = neighbour, result
+        # Only the operator of the neighbour that the search moves to is credited with the improvement.
+        for neighbour, operator in zip(neighbours, operators):
+            self.operator_selection.reward(operator, improved=neighbour == best and best_result[0] > self.fitness)
+        return best, best_result
+
+    @property
+    def items(self):
+        """
+        The items that have to be packed in bins. If only their sizes were given, the Item objects are created the first
+        time they are asked for, e.g. to pack the bins of a solution.
+        :return: A list of items.
+        """
+        if self._items is None:
+            self._items = [Item(size) for size in self.sizes]
+        return self._items
+
+    @property
+    def bins(self):
+        """
+        The bins of the current solution. The search only keeps track of the fitness and number of bins of the current
+        solution, so the bins are packed from the current combination the first time they are asked for.
+        :return: A list of bins.
+        """
+        if self._bins is None:
+            self._bins = self.generate_solution(self.combination)
+        return self._bins
+
+    @bins.setter
+    def bins(self, bins):
+        self._bins = bins
+
+    def reached_lower_bound(self):
+        """
+        Checks whether the current solution uses the provably minimal number of bins.
+        :return: True if the lower bound has been reached, False otherwise.
+        """
+        return self.lower_bound is not None and self.num_bins <= self.lower_bound
 
     def generate_solution(self, pattern):
         """
@@ -61,17 +266,83 @@ class TabuSearch:
         :param pattern: A pattern indicating the order in which heuristics need to be applied to get the solution.
         :return: A list of bins to serve as a solution.
         """
-        solution = [Bin(self.bin_capacity)]
+        solution = IndexedBins(self.bin_capacity)
         pattern_length = len(pattern)
         for idx, item in enumerate(self.items):
             h = pattern[idx % pattern_length]
             solution = self.heuristic_map[h].apply(item, solution)
         return solution
 
-    def apply_move_operator(self, pattern):
+    def cache_key(self, pattern):
+        """
+        Gets the key under which the evaluation of a pattern is cached.
+        :param pattern: The pattern.
+        :return: (item fingerprint, canonical pattern)
+        """
+        return self.fingerprint, canonical_pattern(pattern, len(self.sizes))
+
+    def evaluate(self, pattern, base=None, threshold=None):
+        """
+        Evaluates a pattern, reusing the cached result if an equivalent pattern has been evaluated before. Otherwise the
+        packing resumes from the last checkpoint of the base pattern before the two patterns diverge.
+        :param pattern: The pattern to evaluate.
+        :param base: An optional pattern, evaluated before, that the new pattern was derived from.
+        :param threshold: An optional fitness to beat. The evaluation is aborted once it provably cannot.
+        :return: (fitness, num_bins), or None if the evaluation was aborted.
+        """
+        key = self.cache_key(pattern)
+        result = self.cache.get(key)
+        if result is None:
+            self.instrumentation.count("evaluations")
+            result = self.evaluator.evaluate(pattern, base, threshold)
+            if result is not None:
+                self.cache.put(key, result)
+        else:
+            self.instrumentation.count("duplicate_patterns")
+        return result
+
+    def evaluate_neighbours(self, patterns, base):
+        """
+        Evaluates the neighbours of a pattern, looking equivalent patterns up in the cache and evaluating the others on
+        the worker pool if there is one, or with the checkpointed evaluator.
+        :param patterns: The neighbours to evaluate.
+        :param base: The pattern that the neighbours were derived from.
+        :return: A list of (fitness, num_bins) tuples, or None for aborted evaluations, one per pattern.
+        """
+        keys = [self.cache_key(pattern) for pattern in patterns]
+        results = {key: self.cache.get(key) for key in keys}
+        missing = {}
+        for pattern, key in zip(patterns, keys):
+            if results[key] is None:
+                missing.setdefault(key, pattern)
+        self.instrumentation.count("evaluations", len(missing))
+        self.instrumentation.count("duplicate_patterns", len(patterns) - len(missing))
+        tasks = [(pattern, base, self.fitness if self.early_abort else None) for pattern in missing.values()]
+        if self.pool is not None:
+            evaluated = self.pool.evaluate(*zip(*tasks)) if tasks else []
+        else:
+            evaluated = [self.evaluator.evaluate(*task) for task in tasks]
+        for key, result in zip(missing, evaluated):
+            results[key] = result
+            if result is not None:
+                self.cache.put(key, result)
+        return [results[key] for key in keys]
+
+    def close(self):
+        """
+        Shuts down the worker processes, if any.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def apply_move_operator(self, pattern, operator=None):
         """
-        Applies a random move operator to the given pattern.
+        Applies a move operator to the given pattern.
         :param pattern: The pattern to apply the move operator to.
+        :param operator: The index of the operator in movers. Picked by the operator selection if not given.
         :return: The pattern after the move operator has been applied.
         """
-        return random.choice(self.movers).apply(pattern, list(self.heuristic_map.keys()))
+        if operator is None:
+            operator = self.operator_selection.select(self.rng)
+        return self.movers[operator].apply(pattern, list(self.heuristic_map), self.rng)
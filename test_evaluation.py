@@ -0,0 +1,115 @@
+from bin import Bin
+from evaluation import Evaluator, first_divergence
+from heuristics import BestFit, FirstFit, NextFit, WorstFit
+from item import Item
+from move_operators import Add, Change, Remove, Swap
+import random
+import unittest
+
+heuristic_map = {
+    "f": FirstFit,
+    "n": NextFit,
+    "w": WorstFit,
+    "b": BestFit,
+}
+operators = [Add, Change, Remove, Swap]
+
+
+def repack(capacity, items, pattern):
+    """
+    Packs the items from scratch with plain Bin objects, the way the original code did.
+    :return: (fitness, num_bins)
+    """
+    bins = [Bin(capacity)]
+    for idx, item in enumerate(items):
+        bins = heuristic_map[pattern[idx % len(pattern)]].apply(item, bins)
+    return sum(b.fitness() for b in bins) / len(bins), len(bins)
+
+
+def random_pattern(rng, max_length=8):
+    return "".join(rng.choice(list(heuristic_map)) for _ in range(rng.randint(1, max_length)))
+
+
+class EvaluatorTest(unittest.TestCase):
+    INSTANCES = [(10, 1, 10, 60), (150, 20, 100, 300), (1000, 1, 500, 250), (100000, 20000, 35000, 200)]
+
+    def instances(self, seed):
+        rng = random.Random(seed)
+        for capacity, smallest, largest, num_items in self.INSTANCES:
+            yield capacity, [Item(rng.randint(smallest, largest)) for _ in range(num_items)]
+
+    def walk(self, evaluator, capacity, items, rng, steps=60):
+        """
+        Evaluates a chain of patterns, each derived from an earlier one by a random move operator, and checks every
+        result against a full re-pack.
+        """
+        patterns = [random_pattern(rng)]
+        self.assertEqual(evaluator.evaluate(patterns[0]), repack(capacity, items, patterns[0]))
+        for _ in range(steps):
+            base = rng.choice(patterns)
+            pattern = rng.choice(operators).apply(base, list(heuristic_map), rng)
+            self.assertEqual(evaluator.evaluate(pattern, base), repack(capacity, items, pattern), (base, pattern))
+            patterns.append(pattern)
+
+    def test_move_operators_match_full_repack(self):
+        rng = random.Random(1)
+        for capacity, items in self.instances(1):
+            for interval in [1, 3, 16, 64]:
+                for budget in [0, 50, Evaluator.MEMORY_BUDGET]:
+                    evaluator = Evaluator(capacity, items, checkpoint_interval=interval, memory_budget=budget)
+                    self.walk(evaluator, capacity, items, rng)
+                    self.assertLessEqual(evaluator.memory_used, max(budget, 1) + 1)
+
+    def test_long_patterns_match_full_repack(self):
+        rng = random.Random(2)
+        for capacity, items in self.instances(2):
+            evaluator = Evaluator(capacity, items, checkpoint_interval=2)
+            patterns = [random_pattern(rng, 40)]
+            for _ in range(40):
+                base = rng.choice(patterns)
+                pattern = rng.choice(operators).apply(base, list(heuristic_map), rng)
+                self.assertEqual(evaluator.evaluate(pattern, base), repack(capacity, items, pattern))
+                patterns.append(pattern)
+            self.assertGreater(evaluator.items_skipped, 0)
+
+    def test_unknown_base_packs_from_scratch(self):
+        rng = random.Random(3)
+        for capacity, items in self.instances(3):
+            evaluator = Evaluator(capacity, items)
+            pattern = random_pattern(rng)
+            self.assertEqual(evaluator.evaluate(pattern, "fnwb"), repack(capacity, items, pattern))
+            self.assertEqual(evaluator.items_skipped, 0)
+
+    def test_threshold_aborts_only_patterns_that_cannot_beat_it(self):
+        rng = random.Random(4)
+        for capacity, items in self.instances(4):
+            for interval in [1, 16]:
+                evaluator = Evaluator(capacity, items, checkpoint_interval=interval)
+                patterns = [random_pattern(rng)]
+                evaluator.evaluate(patterns[0])
+                aborted = 0
+                for _ in range(60):
+                    base = rng.choice(patterns)
+                    pattern = rng.choice(operators).apply(base, list(heuristic_map), rng)
+                    expected = repack(capacity, items, pattern)
+                    threshold = repack(capacity, items, rng.choice(patterns))[0] * rng.uniform(0.9, 1.1)
+                    result = evaluator.evaluate(pattern, base, threshold)
+                    if result is None:
+                        aborted += 1
+                        self.assertLessEqual(expected[0], threshold)
+                    else:
+                        self.assertEqual(result, expected)
+                    patterns.append(pattern)
+                self.assertEqual(evaluator.evaluations_aborted, aborted)
+
+    def test_first_divergence(self):
+        rng = random.Random(5)
+        for _ in range(500):
+            old, new = random_pattern(rng, 12), random_pattern(rng, 12)
+            num_items = rng.randint(1, 300)
+            expected = next((idx for idx in range(num_items) if old[idx % len(old)] != new[idx % len(new)]), num_items)
+            self.assertEqual(first_divergence(old, new, num_items), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
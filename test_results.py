@@ -0,0 +1,83 @@
+from results import ResultSink, read_records
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Writes records to a results file and kills the process without closing it, the way a killed campaign does.
+KILLED_WRITER = """
+import gzip, json, os, sys
+from results import ResultSink
+path, count, legacy = sys.argv[1], int(sys.argv[2]), sys.argv[3] == "legacy"
+if legacy:
+    # Results files used to be written as a single gzip member that is only finished when the file is closed.
+    file = gzip.open(path, "at")
+    for i in range(count):
+        file.write(json.dumps({"job": ["d", "a", i, 0], "results": {}}) + "\\n")
+        file.flush()
+else:
+    sink = ResultSink(path)
+    for i in range(count):
+        sink.write(["d", "a", i, 0], {})
+os._exit(0)
+"""
+
+
+class ResultSinkTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def kill_while_writing(self, path, count, legacy=False):
+        root = os.path.dirname(os.path.abspath(__file__))
+        subprocess.run([sys.executable, "-c", KILLED_WRITER, path, str(count), "legacy" if legacy else "new"],
+                       cwd=root, env=dict(os.environ, PYTHONPATH=root), check=True)
+
+    def resume(self, path, first, count):
+        with ResultSink(path) as sink:
+            for i in range(first, first + count):
+                sink.write(["d", "a", i, 0], {})
+
+    def iterations(self, path):
+        return [record["job"][2] for record in read_records(path)]
+
+    def test_kill_and_resume(self):
+        for name in ["results.jsonl", "results.jsonl.gz"]:
+            path = os.path.join(self.directory.name, name)
+            self.kill_while_writing(path, 3)
+            self.resume(path, 3, 3)
+            self.assertEqual(self.iterations(path), list(range(6)), name)
+
+    def test_resume_after_unfinished_gzip_member(self):
+        path = os.path.join(self.directory.name, "results.jsonl.gz")
+        self.kill_while_writing(path, 3, legacy=True)
+        self.resume(path, 3, 3)
+        self.assertEqual(self.iterations(path), list(range(6)))
+
+    def test_resume_after_torn_record(self):
+        for name in ["results.jsonl", "results.jsonl.gz"]:
+            path = os.path.join(self.directory.name, name)
+            self.kill_while_writing(path, 3)
+            # The campaign was killed while the last record was being written.
+            with open(path, "r+b") as file:
+                file.truncate(os.path.getsize(path) - 20)
+            self.assertEqual(self.iterations(path), [0, 1], name)
+            self.resume(path, 2, 3)
+            self.assertEqual(self.iterations(path), list(range(5)), name)
+
+    def test_corrupt_data_ends_the_records(self):
+        for name in ["results.jsonl", "results.jsonl.gz"]:
+            path = os.path.join(self.directory.name, name)
+            self.resume(path, 0, 2)
+            with open(path, "ab") as file:
+                file.write(b"\x1f\x8b\x08\x00garbage")
+            self.assertEqual(self.iterations(path), [0, 1], name)
+            self.resume(path, 2, 1)
+            self.assertEqual(self.iterations(path), [0, 1, 2], name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+from genetic_algorithm import GeneticAlgorithm
+from rng import make_rng
+from runner import snapshot_path
+from snapshots import Snapshotter
+from tabu_memory import make_tabu_list
+from tabu_search import TabuSearch
+import os
+import random
+import tempfile
+import unittest
+
+
+class SnapshotTest(unittest.TestCase):
+    CAPACITY = 150
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "snapshot.json")
+        rng = random.Random(0)
+        self.sizes = [rng.randint(20, 100) for _ in range(300)]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def tabu_search(self, seed, tabu_list="unlimited", snapshotter=None):
+        search = TabuSearch(self.CAPACITY, sizes=self.sizes, rng=make_rng(seed), snapshotter=snapshotter,
+                            tabu_list=make_tabu_list(tabu_list, None if tabu_list == "unlimited" else 50))
+        search.MAX_ITERATIONS, search.MAX_NO_CHANGE = 400, 150
+        return search
+
+    def genetic_algorithm(self, seed, snapshotter=None):
+        search = GeneticAlgorithm(self.CAPACITY, sizes=self.sizes, rng=make_rng(seed), snapshotter=snapshotter)
+        search.MAX_GENERATIONS = 12
+        return search
+
+    @staticmethod
+    def interrupt(search, steps):
+        """
+        Runs a search until it has found a number of incumbents and stops it without letting it finish, the way a
+        killed process would.
+        """
+        incumbents = search.iterate()
+        for _ in range(steps):
+            next(incumbents, None)
+        incumbents.close()
+
+    def test_tabu_search_resumes_identically(self):
+        for tabu_list in ["unlimited", "fifo", "hashed", "bloom"]:
+            for steps in [1, 3]:
+                search = self.tabu_search(7, tabu_list)
+                expected = search.run(), search.fitness, search.num_bins, sorted(search.tabu_list)
+                self.interrupt(self.tabu_search(7, tabu_list, Snapshotter(self.path, 0)), steps)
+                # The random number generator is restored from the snapshot, so its seed does not matter.
+                resumed = self.tabu_search(12345, tabu_list, Snapshotter(self.path, 0))
+                actual = resumed.run(), resumed.fitness, resumed.num_bins, sorted(resumed.tabu_list)
+                self.assertEqual(actual, expected, (tabu_list, steps))
+                os.remove(self.path)
+
+    def test_genetic_algorithm_resumes_identically(self):
+        for steps in [1, 3]:
+            search = self.genetic_algorithm(7)
+            expected = search.run(), search.best_solution.pattern, search.best_solution.fitness
+            self.interrupt(self.genetic_algorithm(7, Snapshotter(self.path, 0)), steps)
+            resumed = self.genetic_algorithm(12345, Snapshotter(self.path, 0))
+            actual = resumed.run(), resumed.best_solution.pattern, resumed.best_solution.fitness
+            self.assertEqual(actual, expected, steps)
+            os.remove(self.path)
+
+    def test_snapshot_of_another_search_is_ignored(self):
+        self.interrupt(self.tabu_search(7, snapshotter=Snapshotter(self.path, 0)), 2)
+        self.sizes.reverse()
+        search = self.tabu_search(8)
+        expected = search.run(), search.fitness, search.num_bins
+        resumed = self.tabu_search(8, snapshotter=Snapshotter(self.path, 0))
+        self.assertEqual((resumed.run(), resumed.fitness, resumed.num_bins), expected)
+        # The stale snapshot was replaced by one of the new search.
+        self.assertIsNotNone(Snapshotter(self.path).read("TabuSearch", resumed.fingerprint))
+        self.assertIsNone(Snapshotter(self.path).read("GA", resumed.fingerprint))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_snapshot_path_depends_on_seed(self):
+        self.assertNotEqual(snapshot_path("snapshots", ("HARD1.BPP", "TabuSearch", 0, 1)),
+                            snapshot_path("snapshots", ("HARD1.BPP", "TabuSearch", 0, 2)))
+
+
+if __name__ == '__main__':
+    unittest.main()